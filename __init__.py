@@ -27,11 +27,19 @@ SOFTWARE.
 Thin wrapper around Maya API & cmds to make interacting with nodes more convenient.
 Read more over at https://github.com/peerke88/cmdWrapper
 """
-import warnings, sys, functools
+import warnings, sys, functools, re, os, contextlib, weakref, array, itertools
 from math import degrees
 # noinspection PyUnresolvedReferences
 from maya.api.OpenMaya import MMatrix, MVector, MTransformationMatrix, MGlobal, MDagPath, MFn, \
-    MFnDependencyNode, MDGModifier, MDagModifier, MObject, MEulerRotation, MPoint, MQuaternion, MFnAttribute, MFn
+    MFnDependencyNode, MDGModifier, MDagModifier, MObject, MEulerRotation, MPoint, MQuaternion, MFnAttribute, MFn, \
+    MNodeClass, MFnNumericAttribute, MFnNumericData, MFnUnitAttribute, MFnTypedAttribute, MFnData, MFnMatrixData, \
+    MFnStringData, MFnStringArrayData, MFnDoubleArrayData, MFnIntArrayData, MDistance, MAngle, MTime, MSelectionList, \
+    MObjectHandle, MDGMessage, MSceneMessage, MNodeMessage, MDagMessage, MSpace, MFnTransform, MPlug, \
+    MMessage, MItDag, MFnMesh, MFnNurbsCurve, MFnNurbsSurface, MPointArray, \
+    MIntArray, MDoubleArray, MFnSingleIndexedComponent, MFnDoubleIndexedComponent, MTimeArray, MDGContext, \
+    MFnPointArrayData, MFnVectorArrayData, MVectorArray, MItDependencyGraph
+# noinspection PyUnresolvedReferences
+from maya.api.OpenMayaAnim import MFnSkinCluster, MFnAnimCurve, MAnimCurveChange, MAnimUtil
 # noinspection PyUnresolvedReferences
 from maya import cmds as _cmds
 # noinspection PyUnresolvedReferences
@@ -41,6 +49,13 @@ from maya.OpenMaya import MGlobal as _oldMGlobal
 # noinspection PyUnresolvedReferences
 from maya.OpenMaya import MObject as _oldMObject
 from json import JSONEncoder
+from collections import OrderedDict
+
+try:
+    # optional, bulk functions return numpy arrays when it is available
+    import numpy as _np
+except ImportError:
+    _np = None
 
 if sys.version_info.major == 2:
     # Override python 2 with python 3 behaviour so the 'new' names are their faster, iterator based versions
@@ -52,8 +67,11 @@ if sys.version_info.major == 2:
 
     # noinspection PyUnresolvedReferences, PyShadowingBuiltins
     range = xrange
+    # noinspection PyUnresolvedReferences
+    _scalarTypes = frozenset((int, long, float, bool, str, unicode, type(None)))
 else:
     basestring = str
+    _scalarTypes = frozenset((int, float, bool, str, type(None)))
 
 
 def _default(self, obj):
@@ -63,6 +81,97 @@ def _default(self, obj):
 _default.default = JSONEncoder().default
 JSONEncoder.default = _default
 _debug = False
+_attributeBackend = 'cmds'
+
+
+def setAttributeBackend(backend):
+    """
+    Choose how _Attribute.get() and set() talk to Maya:
+    'cmds' goes through cmds.getAttr / cmds.setAttr (default),
+    'api' resolves the MPlug once and uses typed plug accessors, falling back to cmds for unsupported types.
+    """
+    global _attributeBackend
+    if backend not in ('cmds', 'api'):
+        raise ValueError('Unknown attribute backend "%s", expected "cmds" or "api"' % backend)
+    _attributeBackend = backend
+
+
+_arrayFormat = 'numpy' if _np is not None else 'array'
+
+
+def setArrayFormat(arrayFormat):
+    """
+    Choose how doubleArray, Int32Array, pointArray and vectorArray values are returned:
+    'numpy' arrays of shape (N,), (N, 4) for points and (N, 3) for vectors (default when numpy is available),
+    or flat 'array' (array.array) buffers. set() accepts both as well as lists.
+    """
+    global _arrayFormat
+    if arrayFormat not in ('numpy', 'array'):
+        raise ValueError('Unknown array format "%s", expected "numpy" or "array"' % arrayFormat)
+    if arrayFormat == 'numpy':
+        _requireNumpy()
+    _arrayFormat = arrayFormat
+
+
+_returnKinds = {}  # command name -> (kind, query kind, edit kind), see registerReturnKind
+
+
+def registerReturnKind(command, kind, queryKind=None, editKind=None):
+    """
+    Tell cmds what a maya command returns, so string results are only turned into nodes when they can be nodes:
+    'value' results are returned as they are and 'auto' (what unregistered commands use) tries to wrap
+    every string that is returned into a node or attribute.
+    queryKind and editKind are used when the command runs in query or edit mode, they default to kind.
+    """
+    for k in (kind, queryKind, editKind):
+        if k is not None and k not in ('auto', 'value'):
+            raise ValueError('Unknown return kind "%s" for %s' % (k, command))
+    _returnKinds[command] = (kind, queryKind or kind, editKind or kind)
+
+
+def _returnKind(command, kwargs):
+    kinds = _returnKinds.get(command)
+    if kinds is None:
+        return 'auto'
+    if kwargs.get('q', kwargs.get('query')):
+        return kinds[1]
+    if kwargs.get('e', kwargs.get('edit')):
+        return kinds[2]
+    return kinds[0]
+
+
+# commands that never return nodes, file and keyframe are left out as some of their flags do (returnNewNodes, name)
+for _command in ('about', 'addAttr', 'aliasAttr', 'attributeQuery', 'connectAttr', 'currentTime', 'currentUnit',
+                 'deleteAttr', 'disconnectAttr', 'exactWorldBoundingBox', 'getAttr', 'internalVar', 'isConnected',
+                 'listAttr', 'loadPlugin', 'namespace', 'nodeType', 'objectCenter', 'objectType', 'objExists',
+                 'optionVar', 'playbackOptions', 'pluginInfo', 'pointPosition', 'polyEvaluate', 'setAttr',
+                 'setKeyframe', 'undoInfo', 'upAxis', 'workspace', 'xform'):
+    registerReturnKind(_command, 'value')
+# creation commands return their nodes, but values when they are queried or edited
+for _command in ('spaceLocator', 'circle', 'curve', 'polyCube', 'polySphere', 'polyPlane', 'polyCylinder', 'polyCone',
+                 'polyTorus', 'nurbsPlane', 'nurbsCube', 'sphere', 'cone', 'cylinder', 'torus', 'camera', 'joint'):
+    registerReturnKind(_command, 'auto', 'value', 'value')
+registerReturnKind('sets', 'auto', 'auto', 'value')
+del _command
+
+
+def _unwrap(value):
+    # scalars and strings pass straight through, containers are only copied when they hold wrapped objects
+    if type(value) in _scalarTypes:
+        return value
+    if isinstance(value, (_Attribute, DependNode)):
+        return str(value)
+    if isinstance(value, basestring) or not hasattr(value, '__iter__'):
+        return value
+    for e in value:
+        if type(e) not in _scalarTypes:
+            break
+    else:
+        return value
+    unwrapped = [_unwrap(e) for e in value]
+    if all(a is b for a, b in zip(unwrapped, value)):
+        return value
+    return type(value)(unwrapped)
 
 
 class _Cmd(object):
@@ -71,59 +180,62 @@ class _Cmd(object):
     and _Attribute instance arguments instead of strings.
     """
 
-    def __init__(self, fn):
+    def __init__(self, fn, name=None):
         self.fn = fn
+        self.name = name or getattr(fn, '__name__', '')
 
     def __call__(self, *args, **kwargs):
-        def unwrap(v):
-            if isinstance(v, basestring):
-                return v
-            if isinstance(v, (_Attribute, DependNode)):
-                return str(v)
-            if hasattr(v, '__iter__'):
-                return type(v)(unwrap(e) for e in v)
-            return v
-
-        args = tuple(unwrap(a) for a in args)
+        args = tuple(_unwrap(a) for a in args)
         for k, a in kwargs.items():
-            if isinstance(a, (_Attribute, DependNode)):
-                kwargs[k] = unwrap(a)
+            if type(a) not in _scalarTypes:
+                kwargs[k] = _unwrap(a)
+        kind = _returnKind(self.name, kwargs)
         return_value = self.fn(*args, **kwargs)
 
         # wrap return value if it is a list of nodes
-        if _isStringOrStringList(return_value):
+        if kind != 'value' and _isStringOrStringList(return_value):
             # we return the original value in case the wrapper is None,
             # this can happen when maya returns a str or str[] that does not represent nodes
             tmp = getNode(return_value)
             if tmp is None or (isinstance(tmp, (list, tuple)) and set(tmp) == {None}):
                 return return_value
-            return_value = tmp
+            return tmp
 
         return _wrapMathObjects(return_value)
 
 
 class _Cmds(object):
     def __getattr__(self, item):
-        return _Cmd(getattr(_cmds, item))
+        # only called once per command, after that the _Cmd is found on the instance
+        cmd = _Cmd(getattr(_cmds, item), item)
+        setattr(self, item, cmd)
+        return cmd
 
 
 cmds = _Cmds()
 
 
-def _getMObject(nodeName):
-    return MGlobal.getSelectionListByName(nodeName).getDependNode(0)
-
-
 def _getMDagPath(nodeName):
     return MGlobal.getSelectionListByName(nodeName).getDagPath(0)
 
 
-def _wrapReturnValue(cls, fn, *args, **kwargs):
-    return cls(fn(*args, **kwargs))
+def _getMPlug(plugName):
+    return MGlobal.getSelectionListByName(plugName).getPlug(0)
+
+
+def _resolveNode(nodeName):
+    # one name lookup for both the MObject and, for dag nodes, the MDagPath
+    selectionList = MGlobal.getSelectionListByName(nodeName)
+    mobject = selectionList.getDependNode(0)
+    if mobject.hasFn(MFn.kDagNode):
+        return mobject, selectionList.getDagPath(0)
+    return mobject, None
 
 
-def _installMathFunctions(cls, size, wrap_return_attrs, ops):
-    # type: (type, int, tuple, str)->None
+def _installMathFunctions(cls, size, ops):
+    # type: (type, int, str)->None
+    # methods returning a new instance of the base class are written out on the classes themselves
+    baseGetItem = cls.__bases__[0].__getitem__
 
     def __getstate__(self):
         # make sure this object returns a list so pickle works
@@ -161,8 +273,8 @@ def _installMathFunctions(cls, size, wrap_return_attrs, ops):
         super(cls, self).__setitem__(index, value)
 
     def __iter__(self):
-        for i in range(len(self)):
-            yield self[i]
+        for i in range(size):
+            yield baseGetItem(self, i)
 
     def __eq__(self, other):
         if hasattr(other, '__iter__'):
@@ -177,12 +289,6 @@ def _installMathFunctions(cls, size, wrap_return_attrs, ops):
             return cls(maybeCast)
         return maybeCast
 
-    def __getattribute__(self, attr):
-        result = super(cls, self).__getattribute__(attr)
-        if attr in wrap_return_attrs:
-            return functools.partial(_wrapReturnValue, self.__class__, result)
-        return result
-
     def __xor__(self, right):
         # noinspection PyUnresolvedReferences
         return _wrap(super(cls, self).__xor__(right))
@@ -228,7 +334,6 @@ def _installMathFunctions(cls, size, wrap_return_attrs, ops):
     cls.__ne__ = __ne__
     cls.to_json = to_json
     cls._wrap = _wrap
-    cls.__getattribute__ = __getattribute__
     if ops:
         if '+' in ops:
             cls.__add__ = __add__
@@ -287,6 +392,18 @@ class Matrix(MMatrix):
     def quaternion(self):
         return QuaternionOrPoint().setValue(self)
 
+    def transpose(self):
+        return self.__class__(super(Matrix, self).transpose())
+
+    def inverse(self):
+        return self.__class__(super(Matrix, self).inverse())
+
+    def adjoint(self):
+        return self.__class__(super(Matrix, self).adjoint())
+
+    def homogenize(self):
+        return self.__class__(super(Matrix, self).homogenize())
+
 
 class Vector(MVector):
     def __init__(self, *args):
@@ -324,6 +441,15 @@ class Vector(MVector):
     def isZ(self):
         return (abs(self.normal() * Vector.zAxis) > .999)
 
+    def rotateBy(self, *args):
+        return self.__class__(super(Vector, self).rotateBy(*args))
+
+    def normal(self):
+        return self.__class__(super(Vector, self).normal())
+
+    def transformAsNormal(self, matrix):
+        return self.__class__(super(Vector, self).transformAsNormal(matrix))
+
 
 class Euler(MEulerRotation):
     def asQuaternion(self):
@@ -344,6 +470,24 @@ class Euler(MEulerRotation):
     def __repr__(self):
         return '[%s] %s : %s' % (', '.join(str(self[i]) for i in range(3)), self.order, self.__class__.__name__)
 
+    def inverse(self):
+        return self.__class__(super(Euler, self).inverse())
+
+    def reorder(self, order):
+        return self.__class__(super(Euler, self).reorder(order))
+
+    def bound(self):
+        return self.__class__(super(Euler, self).bound())
+
+    def alternateSolution(self):
+        return self.__class__(super(Euler, self).alternateSolution())
+
+    def closestSolution(self, target):
+        return self.__class__(super(Euler, self).closestSolution(target))
+
+    def closestCut(self, target):
+        return self.__class__(super(Euler, self).closestCut(target))
+
 
 class QuaternionOrPoint(MQuaternion):
     def __init__(self, *args):
@@ -372,12 +516,27 @@ class QuaternionOrPoint(MQuaternion):
     def asMatrix(self):
         return Matrix(super(QuaternionOrPoint, self).asMatrix())
 
+    def normal(self):
+        return self.__class__(super(QuaternionOrPoint, self).normal())
 
-# TODO: If this is slow to import maybe we need to write it all out so it's just all one big pyc instead of a bunch of dynamic changes
-_installMathFunctions(Matrix, 16, ('transpose', 'inverse', 'adjoint', 'homogenize'), '+-*')
-_installMathFunctions(Vector, 3, ('rotateBy', 'normal', 'transformAsNormal'), '+-*/^')
-_installMathFunctions(Euler, 3, ('inverse', 'reorder', 'bound', 'alternateSolution', 'closestSolution', 'closestCut'), '+-*')
-_installMathFunctions(QuaternionOrPoint, 4, ('normal', 'conjugate', 'inverse', 'log', 'exp'), '+-')
+    def conjugate(self):
+        return self.__class__(super(QuaternionOrPoint, self).conjugate())
+
+    def inverse(self):
+        return self.__class__(super(QuaternionOrPoint, self).inverse())
+
+    def log(self):
+        return self.__class__(super(QuaternionOrPoint, self).log())
+
+    def exp(self):
+        return self.__class__(super(QuaternionOrPoint, self).exp())
+
+
+# only plain class attributes are installed here, attribute lookups on the instances never go through python
+_installMathFunctions(Matrix, 16, '+-*')
+_installMathFunctions(Vector, 3, '+-*/^')
+_installMathFunctions(Euler, 3, '+-*')
+_installMathFunctions(QuaternionOrPoint, 4, '+-')
 
 # TODO: Maybe these should all be properties that return a copy to avoid user error in changing these 'constants'
 Euler.decompose = lambda matrix, order: Euler(MEulerRotation.decompose(matrix, order))
@@ -413,6 +572,759 @@ def _wrapMathObjects(value):
     return value
 
 
+def _requireNumpy():
+    if _np is None:
+        raise ImportError('numpy is required for the array containers and bulk array functions')
+
+
+def _matrixData(matrices):
+    # Matrix, MatrixArray or anything numpy can read as (4, 4) / (N, 4, 4)
+    if isinstance(matrices, MatrixArray):
+        return matrices.asArray()
+    if isinstance(matrices, MMatrix):
+        return _np.array(tuple(matrices), dtype=float).reshape(4, 4)
+    return _np.asarray(matrices, dtype=float)
+
+
+class _MathArray(object):
+    """
+    Base for the numpy backed containers, every operation works on all elements at once.
+    The data is stored as a float array of shape (N,) + _shape and can be accessed with asArray().
+    """
+    _shape = ()
+    _element = None
+
+    def __init__(self, data=()):
+        _requireNumpy()
+        self._data = _np.array(data, dtype=float).reshape((-1,) + self._shape)
+
+    @classmethod
+    def _new(cls, data):
+        # wraps an array without copying it
+        inst = cls.__new__(cls)
+        inst._data = data
+        return inst
+
+    @classmethod
+    def fromList(cls, values):
+        _requireNumpy()
+        return cls._new(_np.array([tuple(value) for value in values], dtype=float).reshape((-1,) + cls._shape))
+
+    def toList(self):
+        return [self._element(*row) for row in self._data.tolist()]
+
+    def asArray(self):
+        return self._data
+
+    def copy(self):
+        return self._new(self._data.copy())
+
+    def __array__(self, dtype=None):
+        return self._data if dtype is None else self._data.astype(dtype)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        return iter(self.toList())
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, _np.integer)):
+            return self._element(*self._data[index].ravel().tolist())
+        return self._new(self._data[index])
+
+    def __setitem__(self, index, value):
+        if isinstance(value, _MathArray):
+            value = value.asArray()
+        elif not isinstance(value, _np.ndarray):
+            value = _np.array(tuple(value), dtype=float).reshape(self._shape)
+        self._data[index] = value
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, self._data.tolist())
+
+    def __eq__(self, other):
+        if isinstance(other, _MathArray):
+            other = other.asArray()
+        return _np.array_equal(self._data, other)
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    __hash__ = None
+
+    def isEquivalent(self, other, tolerance=1e-10):
+        if isinstance(other, _MathArray):
+            other = other.asArray()
+        return _np.allclose(self._data, other, rtol=0.0, atol=tolerance)
+
+    def _operand(self, other):
+        if isinstance(other, _MathArray):
+            return other.asArray()
+        if isinstance(other, (MVector, MMatrix, MQuaternion)):
+            return _np.array(tuple(other), dtype=float).reshape(self._shape)
+        return _np.asarray(other, dtype=float)
+
+    def _scale(self, other):
+        # a float or one float per element
+        other = _np.asarray(other, dtype=float)
+        if other.ndim == 1:
+            return other.reshape((-1,) + (1,) * len(self._shape))
+        return other
+
+    def __add__(self, other):
+        return self._new(self._data + self._operand(other))
+
+    def __sub__(self, other):
+        return self._new(self._data - self._operand(other))
+
+    def __neg__(self):
+        return self._new(-self._data)
+
+    def __truediv__(self, other):
+        return self._new(self._data / self._scale(other))
+
+    __div__ = __truediv__
+
+
+class VectorArray(_MathArray):
+    """
+    (N, 3) vectors, mirrors Vector: * is the dot product with vectors and a transform with matrices, ^ the cross product.
+    Matrices follow the Maya row vector convention, so v * M transforms v by M.
+    """
+    _shape = (3,)
+    _element = Vector
+
+    @classmethod
+    def fromList(cls, values):
+        _requireNumpy()
+        return cls._new(_np.array([(v[0], v[1], v[2]) for v in values], dtype=float).reshape(-1, 3))
+
+    def __mul__(self, other):
+        if isinstance(other, (MatrixArray, MMatrix)):
+            return self.transformAsVector(other)
+        if isinstance(other, (VectorArray, MVector)):
+            return self.dot(other)
+        return self._new(self._data * self._scale(other))
+
+    def __rmul__(self, other):
+        return self._new(self._data * self._scale(other))
+
+    def __xor__(self, other):
+        return self.cross(other)
+
+    def dot(self, other):
+        return _np.einsum('ij,ij->i', self._data, _np.broadcast_to(self._operand(other), self._data.shape))
+
+    def cross(self, other):
+        return self._new(_np.cross(self._data, self._operand(other)))
+
+    def length(self):
+        return _np.sqrt(_np.einsum('ij,ij->i', self._data, self._data))
+
+    def normal(self):
+        length = self.length()
+        length[length == 0.0] = 1.0
+        return self._new(self._data / length[:, None])
+
+    def normalize(self):
+        self._data = self.normal().asArray()
+        return self
+
+    def transformAsVector(self, matrices):
+        # ignores the translation, like Vector * Matrix
+        rotation = _matrixData(matrices)[..., :3, :3]
+        return self._new(_np.matmul(self._data[:, None, :], rotation)[:, 0])
+
+    def transformAsPoint(self, matrices):
+        # affine transform including the translation, like Point * Matrix
+        matrices = _matrixData(matrices)
+        return self._new(_np.matmul(self._data[:, None, :], matrices[..., :3, :3])[:, 0] + matrices[..., 3, :3])
+
+    def rotateBy(self, quaternions):
+        if isinstance(quaternions, MQuaternion):
+            quaternions = QuaternionArray([tuple(quaternions)])
+        elif not isinstance(quaternions, QuaternionArray):
+            quaternions = QuaternionArray(quaternions)
+        return self.transformAsVector(quaternions.asMatrix())
+
+
+class MatrixArray(_MathArray):
+    """
+    (N, 4, 4) matrices in Maya's row major layout, the translation is row 3.
+    """
+    _shape = (4, 4)
+    _element = Matrix
+
+    @classmethod
+    def identity(cls, count):
+        _requireNumpy()
+        return cls._new(_np.tile(_np.eye(4), (count, 1, 1)))
+
+    def toList(self):
+        return [Matrix(row) for row in self._data.reshape(-1, 16).tolist()]
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, _np.integer)):
+            return Matrix(self._data[index].ravel().tolist())
+        return self._new(self._data[index])
+
+    def __mul__(self, other):
+        if isinstance(other, (MatrixArray, MMatrix)):
+            return self._new(_np.matmul(self._data, _matrixData(other)))
+        return self._new(self._data * self._scale(other))
+
+    def __rmul__(self, other):
+        if isinstance(other, MMatrix):
+            return self._new(_np.matmul(_matrixData(other), self._data))
+        return self._new(self._data * self._scale(other))
+
+    def inverse(self):
+        return self._new(_np.linalg.inv(self._data))
+
+    def transpose(self):
+        return self._new(_np.ascontiguousarray(self._data.transpose(0, 2, 1)))
+
+    def asT(self):
+        return VectorArray._new(self._data[:, 3, :3].copy())
+
+    def setT(self, translations):
+        self._data[:, 3, :3] = _np.asarray(translations, dtype=float)
+
+    def axis(self, index):
+        return VectorArray._new(self._data[:, index, :3].copy())
+
+
+class QuaternionArray(_MathArray):
+    """
+    (N, 4) quaternions stored as x, y, z, w like QuaternionOrPoint.
+    a * b matches Maya's quaternion product: rotate by a, then by b (the same order as a.asMatrix() * b.asMatrix()).
+    """
+    _shape = (4,)
+    _element = QuaternionOrPoint
+
+    @classmethod
+    def fromList(cls, values):
+        _requireNumpy()
+        return cls._new(_np.array([(q[0], q[1], q[2], q[3]) for q in values], dtype=float).reshape(-1, 4))
+
+    def __mul__(self, other):
+        if isinstance(other, (MatrixArray, MMatrix)):
+            # points as 4d row vectors, like QuaternionOrPoint * Matrix
+            return self._new(_np.matmul(self._data[:, None, :], _matrixData(other))[:, 0])
+        if isinstance(other, (QuaternionArray, MQuaternion)):
+            a = _np.broadcast_to(self._data, _np.broadcast(self._data, self._operand(other)).shape)
+            b = _np.broadcast_to(self._operand(other), a.shape)
+            # the hamilton product b (x) a
+            bv, bw, av, aw = b[:, :3], b[:, 3:], a[:, :3], a[:, 3:]
+            result = _np.empty(a.shape)
+            result[:, :3] = bw * av + aw * bv + _np.cross(bv, av)
+            result[:, 3] = (bw * aw)[:, 0] - _np.einsum('ij,ij->i', bv, av)
+            return self._new(result)
+        return self._new(self._data * self._scale(other))
+
+    def dot(self, other):
+        return _np.einsum('ij,ij->i', self._data, _np.broadcast_to(self._operand(other), self._data.shape))
+
+    def conjugate(self):
+        return self._new(self._data * (-1.0, -1.0, -1.0, 1.0))
+
+    def inverse(self):
+        return self._new(self.conjugate().asArray() / _np.einsum('ij,ij->i', self._data, self._data)[:, None])
+
+    def normal(self):
+        length = _np.sqrt(_np.einsum('ij,ij->i', self._data, self._data))
+        length[length == 0.0] = 1.0
+        return self._new(self._data / length[:, None])
+
+    def normalize(self):
+        self._data = self.normal().asArray()
+        return self
+
+    def asMatrix(self):
+        x, y, z, w = self.normal().asArray().T
+        matrices = _np.zeros((len(self._data), 4, 4))
+        matrices[:, 0, 0] = 1.0 - 2.0 * (y * y + z * z)
+        matrices[:, 0, 1] = 2.0 * (x * y + z * w)
+        matrices[:, 0, 2] = 2.0 * (x * z - y * w)
+        matrices[:, 1, 0] = 2.0 * (x * y - z * w)
+        matrices[:, 1, 1] = 1.0 - 2.0 * (x * x + z * z)
+        matrices[:, 1, 2] = 2.0 * (y * z + x * w)
+        matrices[:, 2, 0] = 2.0 * (x * z + y * w)
+        matrices[:, 2, 1] = 2.0 * (y * z - x * w)
+        matrices[:, 2, 2] = 1.0 - 2.0 * (x * x + y * y)
+        matrices[:, 3, 3] = 1.0
+        return MatrixArray._new(matrices)
+
+    def slerp(self, other, t):
+        # shortest path spherical interpolation, t is a float or one float per quaternion
+        a = self._data
+        b = _np.array(_np.broadcast_to(self._operand(other), a.shape))
+        t = _np.broadcast_to(_np.asarray(t, dtype=float).reshape(-1), (len(a),))[:, None]
+        cosTheta = _np.einsum('ij,ij->i', a, b)
+        flip = cosTheta < 0.0
+        b[flip] *= -1.0
+        cosTheta = _np.abs(cosTheta)[:, None]
+        # nearly parallel quaternions fall back to a linear blend to avoid dividing by sin(0)
+        linear = cosTheta[:, 0] > 0.9995
+        theta = _np.arccos(_np.clip(cosTheta, -1.0, 1.0))
+        sinTheta = _np.sin(theta)
+        sinTheta[linear] = 1.0
+        weightA = _np.where(linear[:, None], 1.0 - t, _np.sin((1.0 - t) * theta) / sinTheta)
+        weightB = _np.where(linear[:, None], t, _np.sin(t * theta) / sinTheta)
+        result = QuaternionArray._new(weightA * a + weightB * b)
+        return result.normalize() if linear.any() else result
+
+
+# attribute types that cmds.setAttr needs to be told about explicitly through the type flag
+_setterTypes = frozenset(('short2', 'short3', 'long2', 'long3', 'Int32Array', 'float2', 'float3', 'double2', 'double3',
+                          'doubleArray', 'matrix', 'pointArray', 'vectorArray', 'string', 'stringArray', 'sphere', 'cone',
+                          'reflectanceRGB', 'spectrumRGB', 'componentList', 'attributeAlias', 'nurbsCurve', 'nurbsSurface',
+                          'nurbsTrimface', 'polyFace', 'mesh', 'lattice'))
+_attributeTypes = {}  # (node type, attribute path without indices) -> getAttr type, only filled for static attributes
+_staticAttributes = {}  # (node type, attribute name) -> bool
+_indexPattern = re.compile(r'\[\d+\]')
+
+
+def _isStaticAttribute(nodeType, attrName):
+    key = (nodeType, attrName)
+    static = _staticAttributes.get(key)
+    if static is None:
+        # noinspection PyBroadException
+        try:
+            static = MNodeClass(nodeType).hasAttribute(attrName)
+        except:
+            static = False
+        _staticAttributes[key] = static
+    return static
+
+
+def _attributeType(path, nodeType=None):
+    # Attributes that exist on every node of a type share their type, so those are only queried once per type.
+    # Dynamic attributes (and anything we can not resolve statically) are queried from the node every time.
+    nodeName, attrName = path.split('.', 1)
+    if nodeType is None:
+        nodeType = _cmds.nodeType(nodeName)
+    key = (nodeType, _indexPattern.sub('[]', attrName))
+    t = _attributeTypes.get(key)
+    if t is not None:
+        return t
+    t = _cmds.getAttr(path, type=True)
+    if _isStaticAttribute(nodeType, key[1].rsplit('.', 1)[-1].split('[', 1)[0]):
+        _attributeTypes[key] = t
+    return t
+
+
+class _Operation(object):
+    """
+    Something that can not be queued on a modifier but still needs to take part in a batch,
+    doIt and undoIt are the callables that apply and revert it.
+    """
+
+    def __init__(self, doIt, undoIt):
+        self._doIt = doIt
+        self._undoIt = undoIt
+        self._done = False
+
+    def doIt(self):
+        if not self._done:
+            self._doIt()
+            self._done = True
+
+    def undoIt(self):
+        if self._done:
+            self._undoIt()
+            self._done = False
+
+
+class _Batch(object):
+    """
+    Ordered list of modifiers and _Operations that are executed and undone as a single step.
+    Use batch() instead of constructing this.
+    """
+
+    def __init__(self):
+        self._operations = []
+        self._done = 0  # the operations before this index have been executed
+        self._commands = []  # keeps the functions queued through _queueCommand alive as long as the batch
+
+    def modifier(self, dag=None):
+        # dag=True requires an MDagModifier (creating or deleting dag nodes), dag=False a plain MDGModifier
+        # (creating dg nodes) and None accepts either, so consecutive operations share one modifier where possible,
+        # modifiers that were executed already are not added to so every operation has either run or not
+        mod = self._operations[-1] if len(self._operations) > self._done else None
+        if not isinstance(mod, MDGModifier) or (dag and not isinstance(mod, MDagModifier)) or \
+                (dag is False and isinstance(mod, MDagModifier)):
+            mod = MDGModifier() if dag is False else MDagModifier()
+            self._operations.append(mod)
+        return mod
+
+    def run(self, operation):
+        # executes everything queued so far first, so the operation keeps its place in the order
+        self.doIt()
+        operation.doIt()
+        self._operations.append(operation)
+        self._done = len(self._operations)
+
+    def doIt(self):
+        # an operation that raises is not counted as executed, so it is not undone either
+        while self._done < len(self._operations):
+            self._operations[self._done].doIt()
+            self._done += 1
+
+    def undoIt(self):
+        while self._done:
+            self._done -= 1
+            self._operations[self._done].undoIt()
+
+
+_activeBatch = None
+_undoQueue = sys.__dict__.setdefault('_cmdWrapperUndoQueue', [])  # shared with the cmdWrapperUndo plug-in
+_undoPlugin = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cmdWrapperUndo.py')
+
+
+_undoPluginLoaded = False
+
+
+def _execute(operations):
+    # run through the cmdWrapperUndo command so the whole batch is a single entry in Maya's undo queue,
+    # operations is anything with doIt and undoIt: a _Batch or a single modifier
+    global _undoPluginLoaded
+    if not _undoPluginLoaded:
+        # noinspection PyBroadException
+        try:
+            if not _cmds.pluginInfo('cmdWrapperUndo', q=True, loaded=True):
+                _cmds.loadPlugin(_undoPlugin, quiet=True)
+        except:
+            if _debug:
+                warnings.warn('Could not load %s, batch() will not be undoable' % _undoPlugin)
+            operations.doIt()
+            return
+        _undoPluginLoaded = True
+    _undoQueue.append(operations)
+    # noinspection PyBroadException
+    try:
+        _cmds.cmdWrapperUndo()
+    except:
+        # the command pops the operations before running them, if they are still queued the plug-in was unloaded
+        if not _undoQueue or _undoQueue[-1] is not operations:
+            raise
+        _undoQueue.pop()
+        _undoPluginLoaded = False
+        _execute(operations)
+
+
+_queuedCommands = weakref.WeakValueDictionary()  # key -> function queued with _queueCommand
+_queuedCommandKeys = itertools.count()
+
+
+def _runQueuedCommand(key):
+    _queuedCommands[key]()
+
+
+def _queueCommand(fn):
+    # queues fn() on the active batch as a python command, so it runs in order with the modifiers and is undone
+    # with them, fn only calls undoable maya commands and resolves node names when it runs, not when it is queued
+    key = next(_queuedCommandKeys)
+    _queuedCommands[key] = fn
+    _activeBatch._commands.append(fn)
+    _activeBatch.modifier().pythonCommandToExecute('import sys\nsys.modules[%r]._runQueuedCommand(%i)' % (__name__, key))
+
+
+@contextlib.contextmanager
+def batch():
+    """
+    Queue attribute sets, (dis)connections, node creation, renames and deletes into API modifiers
+    and execute them as one undoable step when the block exits:
+
+    with batch():
+        for node in nodes:
+            node.translate = (0, 1, 0)
+            node.worldMatrix[0] >> other.offsetParentMatrix
+
+    Nodes have to exist before they can be wrapped, so createNode() executes everything queued up to that point.
+    Nested batches join the outer one, if the block raises everything executed so far is undone.
+    """
+    global _activeBatch
+    if _activeBatch is not None:
+        yield _activeBatch
+        return
+    current = _activeBatch = _Batch()
+    # noinspection PyBroadException
+    try:
+        yield current
+    except:
+        _activeBatch = None
+        current.undoIt()
+        raise
+    _activeBatch = None
+    # noinspection PyBroadException
+    try:
+        _execute(current)
+    except:
+        current.undoIt()
+        raise
+
+
+def _asMPlug(attr):
+    if isinstance(attr, _Attribute):
+        return attr.asPlug()
+    return _getMPlug(str(attr))
+
+
+def _disconnectAttr(source, destination):
+    if _activeBatch is None:
+        cmds.disconnectAttr(str(source), str(destination))
+        return
+    _activeBatch.modifier().disconnect(_asMPlug(source), _asMPlug(destination))
+
+
+def _scalarReader(attr):
+    # returns a function that reads a non-compound plug of this attribute like cmds.getAttr would (UI units),
+    # or None when the attribute type is not supported
+    if attr.hasFn(MFn.kUnitAttribute):
+        unitType = MFnUnitAttribute(attr).unitType()
+        if unitType == MFnUnitAttribute.kDistance:
+            unit = MDistance.uiUnit()
+            return lambda plug: plug.asMDistance().asUnits(unit)
+        if unitType == MFnUnitAttribute.kAngle:
+            unit = MAngle.uiUnit()
+            return lambda plug: plug.asMAngle().asUnits(unit)
+        if unitType == MFnUnitAttribute.kTime:
+            unit = MTime.uiUnit()
+            return lambda plug: plug.asMTime().asUnits(unit)
+        return lambda plug: plug.asDouble()
+    if attr.hasFn(MFn.kEnumAttribute):
+        return lambda plug: plug.asInt()
+    if attr.hasFn(MFn.kNumericAttribute):
+        numericType = MFnNumericAttribute(attr).numericType()
+        if numericType == MFnNumericData.kBoolean:
+            return lambda plug: plug.asBool()
+        if numericType in (MFnNumericData.kByte, MFnNumericData.kChar, MFnNumericData.kShort, MFnNumericData.kInt,
+                           MFnNumericData.kInt64):
+            return lambda plug: plug.asInt()
+        if numericType == MFnNumericData.kFloat:
+            return lambda plug: plug.asFloat()
+        if numericType == MFnNumericData.kDouble:
+            return lambda plug: plug.asDouble()
+        return None
+    if attr.hasFn(MFn.kMatrixAttribute):
+        return lambda plug: Matrix(MFnMatrixData(plug.asMObject()).matrix())
+    if attr.hasFn(MFn.kTypedAttribute):
+        dataType = MFnTypedAttribute(attr).attrType()
+        if dataType == MFnData.kMatrix:
+            return lambda plug: Matrix(MFnMatrixData(plug.asMObject()).matrix())
+        if dataType == MFnData.kString:
+            return functools.partial(_readData, MFnStringData, lambda fn: fn.string())
+        if dataType == MFnData.kStringArray:
+            return functools.partial(_readData, MFnStringArrayData, lambda fn: list(fn.array()))
+        if dataType in _arrayData:
+            return _arrayDataReader(dataType)
+    return None
+
+
+def _readData(fnType, getter, plug):
+    # typed attributes that were never set hold no data, cmds.getAttr returns None for those
+    obj = plug.asMObject()
+    if obj.isNull():
+        return None
+    return getter(fnType(obj))
+
+
+_arrayData = {  # numeric array data type -> (function set, array.array type code, values per element)
+    MFnData.kDoubleArray: (MFnDoubleArrayData, 'd', 1),
+    MFnData.kIntArray: (MFnIntArrayData, 'i', 1),
+    MFnData.kPointArray: (MFnPointArrayData, 'd', 4),
+    MFnData.kVectorArray: (MFnVectorArrayData, 'd', 3),
+}
+_arrayDataTypeNames = frozenset(('doubleArray', 'Int32Array', 'pointArray', 'vectorArray'))  # the same, as getAttr types
+_arrayDataAttributes = set()  # (node type, attribute name) of attributes that were found to hold numeric array data
+
+
+def _arrayDataReader(dataType):
+    # reads numeric array data as numpy arrays or flat array.array buffers, see setArrayFormat
+    fnType, typeCode, size = _arrayData[dataType]
+
+    def read(plug):
+        obj = plug.asMObject()
+        if obj.isNull():
+            return None
+        values = fnType(obj).array()
+        if _arrayFormat == 'array':
+            if size == 1:
+                return array.array(typeCode, values)
+            return array.array(typeCode, [c for value in values for c in value])
+        result = _np.array(values, dtype=float if typeCode == 'd' else _np.int32)
+        return result.reshape(-1, size) if size > 1 else result
+
+    return read
+
+
+def _rows(values, size):
+    # (N, size) numpy arrays, flat buffers and sequences of sequences as a list of tuples
+    if _np is not None and isinstance(values, _np.ndarray):
+        return [tuple(row) for row in values.reshape(-1, values.shape[-1] if values.ndim > 1 else size).tolist()]
+    if isinstance(values, array.array):
+        values = values.tolist()
+        return [tuple(values[i:i + size]) for i in range(0, len(values), size)]
+    return [tuple(row) for row in values]
+
+
+def _createArrayData(dataType, values):
+    # new data for a numeric array attribute from a numpy array, an array.array buffer or a list
+    fnType, typeCode, size = _arrayData[dataType]
+    if size == 1:
+        if _np is not None and isinstance(values, _np.ndarray):
+            values = values.ravel().tolist()
+        return fnType().create((MDoubleArray if typeCode == 'd' else MIntArray)(list(values)))
+    if dataType == MFnData.kPointArray:
+        return fnType().create(MPointArray([MPoint(*row) for row in _rows(values, size)]))
+    return fnType().create(MVectorArray([MVector(*row) for row in _rows(values, size)]))
+
+
+def _plainChildren(plug):
+    # the children of a compound plug, None when one of them is an array or a compound that needs the generic path
+    children = [plug.child(i) for i in range(plug.numChildren())]
+    if not children or any(child.isArray or child.isCompound for child in children):
+        return None
+    return children
+
+
+def _plugReader(plug):
+    if plug.isArray:
+        return None
+    if not plug.isCompound:
+        return _scalarReader(plug.attribute())
+    children = _plainChildren(plug)
+    if children is None:
+        return None
+    readers = [_scalarReader(child.attribute()) for child in children]
+    if None in readers:
+        return None
+    return lambda plug: tuple(reader(plug.child(i)) for i, reader in enumerate(readers))
+
+
+def _scalarWriter(attr):
+    # returns (fn(modifier, plug, values), number of values) for a non-compound plug of this attribute,
+    # values are in UI units like cmds.setAttr expects them, returns (None, 0) when the type is not supported
+    if attr.hasFn(MFn.kUnitAttribute):
+        unitType = MFnUnitAttribute(attr).unitType()
+        if unitType == MFnUnitAttribute.kDistance:
+            unit = MDistance.uiUnit()
+            return lambda mod, plug, v: mod.newPlugValueMDistance(plug, MDistance(v[0], unit)), 1
+        if unitType == MFnUnitAttribute.kAngle:
+            unit = MAngle.uiUnit()
+            return lambda mod, plug, v: mod.newPlugValueMAngle(plug, MAngle(v[0], unit)), 1
+        if unitType == MFnUnitAttribute.kTime:
+            unit = MTime.uiUnit()
+            return lambda mod, plug, v: mod.newPlugValueMTime(plug, MTime(v[0], unit)), 1
+        return lambda mod, plug, v: mod.newPlugValueDouble(plug, v[0]), 1
+    if attr.hasFn(MFn.kEnumAttribute):
+        return lambda mod, plug, v: mod.newPlugValueInt(plug, int(v[0])), 1
+    if attr.hasFn(MFn.kNumericAttribute):
+        numericType = MFnNumericAttribute(attr).numericType()
+        if numericType == MFnNumericData.kBoolean:
+            return lambda mod, plug, v: mod.newPlugValueBool(plug, bool(v[0])), 1
+        if numericType in (MFnNumericData.kByte, MFnNumericData.kChar, MFnNumericData.kShort, MFnNumericData.kInt,
+                           MFnNumericData.kInt64):
+            return lambda mod, plug, v: mod.newPlugValueInt(plug, int(v[0])), 1
+        if numericType == MFnNumericData.kFloat:
+            return lambda mod, plug, v: mod.newPlugValueFloat(plug, v[0]), 1
+        if numericType == MFnNumericData.kDouble:
+            return lambda mod, plug, v: mod.newPlugValueDouble(plug, v[0]), 1
+        return None, 0
+    isMatrix = attr.hasFn(MFn.kMatrixAttribute)
+    if not isMatrix and attr.hasFn(MFn.kTypedAttribute):
+        dataType = MFnTypedAttribute(attr).attrType()
+        if dataType == MFnData.kString:
+            return lambda mod, plug, v: mod.newPlugValueString(plug, v[0]), 1
+        isMatrix = dataType == MFnData.kMatrix
+    if isMatrix:
+        return lambda mod, plug, v: mod.newPlugValue(plug, MFnMatrixData().create(MMatrix(v))), 16
+    return None, 0
+
+
+def _plugWriter(plug):
+    if plug.isArray:
+        return None, 0
+    if not plug.isCompound:
+        return _scalarWriter(plug.attribute())
+    children = _plainChildren(plug)
+    if children is None:
+        return None, 0
+    writers = [_scalarWriter(child.attribute()) for child in children]
+    if any(size != 1 for writer, size in writers):
+        return None, 0
+
+    def write(mod, plug, values):
+        for i, (writer, size) in enumerate(writers):
+            writer(mod, plug.child(i), values[i:i + 1])
+
+    return write, len(writers)
+
+
+def _plugDescendants(plug):
+    # the children of a compound plug and theirs, depth first
+    def children(parent):
+        if parent.isCompound and not parent.isArray:
+            return [parent.child(i) for i in reversed(range(parent.numChildren()))]
+        return []
+
+    stack = children(plug)
+    while stack:
+        plug = stack.pop()
+        yield plug
+        stack.extend(children(plug))
+
+
+def _plugsAndDescendants(plugs, leaf):
+    if not leaf:
+        return plugs
+    result = []
+    for plug in plugs:
+        result.append(plug)
+        result.extend(_plugDescendants(plug))
+    return result
+
+
+def _setPlugFlag(plugs, flag, value):
+    # sets isLocked, isKeyable or isChannelBox on all plugs as one undoable operation
+    value = bool(value)
+    plugs = [plug for plug in plugs if getattr(plug, flag) != value]
+    if not plugs:
+        return
+
+    def apply(state):
+        for i, plug in enumerate(plugs):
+            # noinspection PyBroadException
+            try:
+                setattr(plug, flag, state)
+            except:
+                for done in plugs[:i]:
+                    setattr(done, flag, not state)
+                raise
+
+    with batch() as current:
+        current.run(_Operation(lambda: apply(value), lambda: apply(not value)))
+
+
+def _setPlugValue(plug, values):
+    # queues a typed plug write on the active batch or executes it as its own undoable modifier,
+    # returns False when the plug or values are not supported
+    writer, size = _plugWriter(plug)
+    if writer is None or size != len(values):
+        return False
+    if _activeBatch is not None:
+        writer(_activeBatch.modifier(), plug, values)
+        return True
+    # a single write skips building a _Batch, the modifier goes to the undo command as it is,
+    # when it raises it did not execute so there is nothing to undo
+    mod = MDGModifier()
+    writer(mod, plug, values)
+    _execute(mod)
+    return True
+
+
 class _Attribute(object):
     """
     NOTE: This class implements __setattr__, as such any members assigned to self
@@ -428,23 +1340,11 @@ class _Attribute(object):
     node.attr = 10.0
     """
 
-    def __init__(self, path):
+    def __init__(self, path, nodeType=None):
+        # the attribute type is resolved lazily (see _attributeType), so constructing attributes costs no Maya calls
         self._path = path
-        self._setterKwargs = {}
-
-        # noinspection PyBroadException
-        try:
-            t = cmds.getAttr(str(self._path), type=True)
-        except:
-            if _debug:
-                warnings.warn('Unknown attr type at %s' % self._path)
-            return
-
-        if t in ('short2', 'short3', 'long2', 'long3', 'Int32Array', 'float2', 'float3', 'double2', 'double3',
-                 'doubleArray', 'matrix', 'pointArray', 'vectorArray', 'string', 'stringArray', 'sphere', 'cone',
-                 'reflectanceRGB', 'spectrumRGB', 'componentList', 'attributeAlias', 'nurbsCurve', 'nurbsSurface',
-                 'nurbsTrimface', 'polyFace', 'mesh', 'lattice'):
-            self._setterKwargs['type'] = t
+        self._nodeType = nodeType
+        self._plug = None  # MPlug cache for the 'api' attribute backend
 
     def __call__(self, *args):
         if args:
@@ -456,16 +1356,16 @@ class _Attribute(object):
         return self.name().__hash__()
 
     def __getattr__(self, item):
-        return _Attribute(self._path + '.' + item)
+        return _Attribute(self._path + '.' + item, self._nodeType)
 
     def __setattr__(self, attr, value):
-        if attr in ('_path', '_setterKwargs'):
+        if attr in ('_path', '_nodeType', '_plug'):
             super(_Attribute, self).__setattr__(attr, value)
             return
         getattr(self, attr).set(value)
 
     def __getitem__(self, index):
-        return _Attribute(self._path + '[%i]' % index)
+        return _Attribute(self._path + '[%i]' % index, self._nodeType)
 
     def __setitem__(self, index, value):
         self[index].set(value)
@@ -496,9 +1396,16 @@ class _Attribute(object):
         return self._path
 
     def asPlug(self):
-        _node, _attr = self._path.split('.', 1)
-        _depNode = MFnDependencyNode(_getMObject(_node))
-        return _depNode.findPlug(_attr, False)
+        return _getMPlug(self._path)
+
+    def _mplug(self):
+        if self._plug is None:
+            # noinspection PyBroadException
+            try:
+                self._plug = self.asPlug()
+            except:
+                return None
+        return self._plug
 
     def asMfnAttr(self):
         return MFnAttribute(self.asPlug().attribute())
@@ -532,7 +1439,19 @@ class _Attribute(object):
         return bool(cmds.listConnections(self._path, s=True, d=False))
 
     def type(self):
-        return cmds.getAttr(self._path, type=True)
+        return _attributeType(self._path, self._nodeType)
+
+    def _setterKwargs(self):
+        # noinspection PyBroadException
+        try:
+            t = _attributeType(self._path, self._nodeType)
+        except:
+            if _debug:
+                warnings.warn('Unknown attr type at %s' % self._path)
+            return {}
+        if t in _setterTypes:
+            return {'type': t}
+        return {}
 
     def __str__(self):
         return self._path  # so we can easily throw Attribute() objects into maya functions
@@ -546,22 +1465,30 @@ class _Attribute(object):
         return False
 
     def connect(self, destination):
-        cmds.connectAttr(self._path, str(destination), force=True)
+        if _activeBatch is None:
+            cmds.connectAttr(self._path, str(destination), force=True)
+            return
+        source, destination = self.asPlug(), _asMPlug(destination)
+        mod = _activeBatch.modifier()
+        # mimic connectAttr's force flag
+        for existing in destination.connectedTo(True, False):
+            mod.disconnect(existing, destination)
+        mod.connect(source, destination)
 
     def disconnectInputs(self):
         for source in self.connections(s=True, d=False):
-            cmds.disconnectAttr(str(source), self._path)
+            _disconnectAttr(source, self._path)
 
     def disconnectOutputs(self):
         for target in self.connections(s=False, d=True):
-            cmds.disconnectAttr(self._path, str(target))
+            _disconnectAttr(self._path, target)
 
     def disconnectAll(self):
         self.disconnectInputs()
         self.disconnectOutputs()
         
     def disconnect(self, destination):
-        cmds.disconnectAttr(self._path, str(destination))
+        _disconnectAttr(self._path, destination)
 
     def connections(self, s=True, d=True, asNode=False):
         return cmds.listConnections(self._path, s=s, d=d, p=not asNode, sh=True) or []
@@ -569,62 +1496,322 @@ class _Attribute(object):
     def isConnected(self):
         return bool(cmds.listConnections(self._path, s=True, d=True))
 
-    def get(self):
+    def sample(self, frames):
+        # the values of this attribute at frames as an (F, ...) array, see sampleAttrs
+        return sampleAttrs([self], frames)[0]
+
+    def upstream(self, types=None, match=None, maxDepth=None, prune=None, plugs=False, raw=False, breadthFirst=False):
+        # lazily yields what feeds into this attribute, see DependNode.upstream
+        return _walkGraph(self.asPlug(), False, types, match, maxDepth, prune, plugs, raw, breadthFirst)
+
+    def downstream(self, types=None, match=None, maxDepth=None, prune=None, plugs=False, raw=False,
+                   breadthFirst=False):
+        # lazily yields what this attribute feeds into, see DependNode.upstream
+        return _walkGraph(self.asPlug(), True, types, match, maxDepth, prune, plugs, raw, breadthFirst)
+
+    def animCurve(self):
+        # the anim curve driving this attribute, also through blend and character set nodes, or None
+        curves = MAnimUtil.findAnimation(self.asPlug())
+        return _wrapMObject(curves[0]) if len(curves) else None
+
+    def _value(self):
+        # the value as cmds.getAttr returns it, before wrapping it into math objects
+        if _attributeBackend == 'api':
+            plug = self._mplug()
+            if plug is not None:
+                reader = _plugReader(plug)
+                if reader is not None:
+                    return reader(plug)
         ret = cmds.getAttr(self._path)
         # hacky solution around maya transform attributes returning a list of 1 tuple
         if isinstance(ret, list) and len(ret) == 1 and isinstance(ret[0], tuple):
             ret = ret[0]
-        return _wrapMathObjects(ret)
+        return ret
+
+    def _arrayDataKey(self):
+        return self._nodeType, _indexPattern.sub('[]', self._path.split('.', 1)[1])
+
+    def _mayHoldArrayData(self):
+        # False when the cached type of a static attribute rules out numeric array data, so no plug is resolved,
+        # True when it is array data or not known without asking Maya
+        if self._arrayDataKey() in _arrayDataAttributes:
+            return True
+        known = _attributeTypes.get(self._arrayDataKey()) if self._nodeType is not None else None
+        return known is None or known in _arrayDataTypeNames
+
+    def _arrayDataType(self):
+        # the MFnData type for doubleArray, Int32Array, pointArray and vectorArray attributes, None for anything else,
+        # found through the plug and remembered per node type and attribute name for the next get()
+        plug = self._mplug()
+        if plug is None or plug.isArray:
+            return None
+        attr = plug.attribute()
+        if not attr.hasFn(MFn.kTypedAttribute):
+            return None
+        dataType = MFnTypedAttribute(attr).attrType()
+        if dataType not in _arrayData:
+            return None
+        _arrayDataAttributes.add(self._arrayDataKey())
+        return dataType
+
+    def get(self):
+        if _attributeBackend == 'cmds':
+            # numeric array data is read straight into an array instead of a (huge) list from getAttr, attributes
+            # are only probed when they held array data before or getAttr returns something that could be it
+            if self._arrayDataKey() in _arrayDataAttributes:
+                dataType = self._arrayDataType()
+                if dataType is not None:
+                    return _arrayDataReader(dataType)(self._plug)
+            value = self._value()
+            if (value is None or isinstance(value, (list, tuple))) and self._mayHoldArrayData():
+                dataType = self._arrayDataType()
+                if dataType is not None:
+                    return _arrayDataReader(dataType)(self._plug)
+            return _wrapMathObjects(value)
+        return _wrapMathObjects(self._value())
 
     def set(self, *args, **kwargs):
         assert args
+        if len(args) == 1 and not kwargs and hasattr(args[0], '__iter__') and not isinstance(args[0], basestring) \
+                and self._mayHoldArrayData():
+            dataType = self._arrayDataType()
+            if dataType is not None:
+                with batch() as current:
+                    current.modifier().newPlugValue(self._plug, _createArrayData(dataType, args[0]))
+                return
         if len(args) == 1:
             if hasattr(args[0], '__iter__') and not isinstance(args[0], basestring):
                 args = tuple(args[0])
-        kwargs.update(self._setterKwargs)
+        if (_attributeBackend == 'api' or _activeBatch is not None) and not kwargs:
+            plug = self._mplug()
+            if plug is not None and _setPlugValue(plug, args):
+                return
+        kwargs.update(self._setterKwargs())
+        if _activeBatch is not None:
+            # types the plug writers do not support are queued as a command to keep their place in the batch,
+            # the path is resolved through the node when it runs, as queued renames and reparents may come first
+            node, attr = wrapNode(self._path.split('.', 1)[0]), self._path.split('.', 1)[1]
+            _queueCommand(lambda: _cmds.setAttr('%s.%s' % (node, attr), *args, **kwargs))
+            return
         cmds.setAttr(self._path, *args, **kwargs)
 
+    def getArray(self):
+        """
+        Logical indices and values of all existing elements of this array attribute, read in one pass through plugs.
+        Returns (indices, values), numpy arrays when numpy is available and the values are numeric, lists otherwise.
+        """
+        plug = self.asPlug()
+        if not plug.isArray:
+            raise ValueError('%s is not an array attribute' % self._path)
+        indices = list(plug.getExistingArrayAttributeIndices())
+        reader = _plugReader(plug.elementByPhysicalIndex(0)) if indices else None
+        if reader is None:
+            values = [_Attribute('%s[%i]' % (self._path, index), self._nodeType)._value() for index in indices]
+        else:
+            values = [reader(plug.elementByPhysicalIndex(i)) for i in range(len(indices))]
+        return _column(indices), _column(values)
+
+    def setArray(self, indices, values, clear=False):
+        """
+        Write values to the elements at the logical indices of this array attribute as one undoable step.
+        Values are in UI units like set() takes them: numbers, or sequences for compound and matrix elements.
+        When clear is True the existing elements that are not in indices are removed.
+        """
+        plug = self.asPlug()
+        if not plug.isArray:
+            raise ValueError('%s is not an array attribute' % self._path)
+        indices = [int(index) for index in indices]
+        if len(indices) != len(values):
+            raise ValueError('got %i values for %i indices' % (len(values), len(indices)))
+        with batch() as current:
+            modifier = current.modifier()
+            if clear:
+                keep = set(indices)
+                for index in plug.getExistingArrayAttributeIndices():
+                    if index not in keep:
+                        modifier.removeMultiInstance(plug.elementByLogicalIndex(index), True)
+            writer, size = None, 0
+            for index, value in zip(indices, values):
+                element = plug.elementByLogicalIndex(index)
+                if writer is None:
+                    writer, size = _plugWriter(element)
+                    if writer is None:
+                        raise ValueError('the elements of %s can not be written in bulk' % self._path)
+                if _np is not None and isinstance(value, _np.ndarray):
+                    value = value.ravel().tolist()
+                value = tuple(value) if hasattr(value, '__iter__') else (value,)
+                if len(value) != size:
+                    raise ValueError('%s elements take %i values, got %r' % (self._path, size, value))
+                writer(modifier, element, value)
+
     def _recurse(self):
-        stack = [self._path]
-        cursor = 0
-        while cursor < len(stack):
-            item = stack.pop(cursor)
-            cursor += 1
-            nodeName, attributeName = item.split('.', 1)
-            try:
-                childAttributeNames = cmds.attributeQuery(attributeName, node=nodeName, lc=True)
-            except RuntimeError:
-                childAttributeNames = None
-            if childAttributeNames:
-                for childAttributeName in childAttributeNames:
-                    childAttributePath = nodeName + '.' + childAttributeName
-                    assert childAttributePath not in stack
-                    stack.append(childAttributePath)
-                    yield self.__class__(childAttributePath)
+        # every attribute below this compound, depth first
+        nodeName = self._path.split('.', 1)[0]
+        for plug in _plugDescendants(self.asPlug()):
+            attr = self.__class__(nodeName + '.' + plug.partialName(includeNonMandatoryIndices=True,
+                                                                    includeInstancedIndices=True, useLongNames=True),
+                                  self._nodeType)
+            attr._plug = plug
+            yield attr
 
     def setLocked(self, lock, leaf=False):
-        if leaf:
-            for attr in self._recurse():
-                attr.setLocked(lock, False)
-        cmds.setAttr(self._path, lock=lock)
+        _setPlugFlag(_plugsAndDescendants([self.asPlug()], leaf), 'isLocked', lock)
 
     def setKeyable(self, keyable, leaf=False):
-        if leaf:
-            for attr in self._recurse():
-                attr.setKeyable(keyable, False)
-        cmds.setAttr(self._path, keyable=keyable)
+        _setPlugFlag(_plugsAndDescendants([self.asPlug()], leaf), 'isKeyable', keyable)
 
     def setChannelBox(self, cb, leaf=False):
-        if leaf:
-            for attr in self._recurse():
-                attr.setChannelBox(cb, False)
-        cmds.setAttr(self._path, channelBox=cb)
+        _setPlugFlag(_plugsAndDescendants([self.asPlug()], leaf), 'isChannelBox', cb)
 
 
 class _Transform_Rotate_Attribute(_Attribute):
     def get(self):
-        angles = cmds.getAttr(self._path)[0]
-        return Euler(angles[0], angles[1], angles[2], cmds.getAttr(self._path.split('.', 1)[0] + '.rotateOrder'))
+        angles = self._value()
+        rotateOrder = _Attribute(self._path.split('.', 1)[0] + '.rotateOrder', self._nodeType)._value()
+        return Euler(angles[0], angles[1], angles[2], rotateOrder)
+
+
+# MMessage callback ids by owner, kept in sys so a reloaded module can remove the callbacks of the previous import
+_callbackIds = sys.__dict__.setdefault('_cmdWrapperCallbackIds', {})
+
+
+def _setCallbacks(owner, ids):
+    _removeCallbacks(owner)
+    _callbackIds[owner] = ids
+
+
+def _removeCallbacks(owner):
+    ids = _callbackIds.pop(owner, None)
+    if ids:
+        # noinspection PyBroadException
+        try:
+            MMessage.removeCallbacks(ids)
+        except:
+            pass
+
+
+def _removeAllCallbacks():
+    for owner in list(_callbackIds):
+        _removeCallbacks(owner)
+
+
+_removeAllCallbacks()  # the callbacks of a previous import hold on to its functions and node pool
+
+
+def removeCallbacks():
+    """
+    Remove the callbacks that keep node names and the node pool up to date, call this before unloading the module.
+    They are installed again when the next node is wrapped, importing the module again removes them as well.
+    """
+    global _nameCallbackIds, _nameGeneration
+    _removeAllCallbacks()
+    _nameCallbackIds = None
+    _nameGeneration += 1  # names cached so far can not be trusted without the callbacks
+    DependNode._instances.clear()
+    DependNode._instances._callbackIds = None
+
+
+_nameGeneration = 0  # bumped on every rename and dag change, which invalidates all cached node names
+_nameCallbackIds = None
+
+
+def _namesChanged(*args):
+    global _nameGeneration
+    _nameGeneration += 1
+
+
+def _installNameCallbacks():
+    global _nameCallbackIds
+    ids = []
+    # noinspection PyBroadException
+    try:
+        ids.append(MNodeMessage.addNameChangedCallback(MObject.kNullObj, _namesChanged))
+        ids.append(MDagMessage.addAllDagChangesCallback(_namesChanged))
+    except:
+        if _debug:
+            warnings.warn('Could not install the name changed callbacks, node names will not be cached')
+    _setCallbacks('names', ids)
+    _nameCallbackIds = ids if len(ids) == 2 else []
+
+
+class _NodePool(object):
+    """
+    Weak map of MObjectHandle hash -> DependNode with an optional maximum size (least recently used entries go first).
+    Entries are dropped when the wrapper is garbage collected, when the node is removed from the scene
+    and when a scene is created or opened.
+    """
+
+    def __init__(self, maxSize=None):
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> weakref
+        self._callbackIds = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        inst = entry() if entry is not None else None
+        if inst is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.maxSize is not None:
+            # mark as most recently used
+            del self._entries[key]
+            self._entries[key] = entry
+        return inst
+
+    def add(self, key, inst):
+        if self._callbackIds is None:
+            self._installCallbacks()
+        self._entries.pop(key, None)
+        self._entries[key] = weakref.ref(inst, functools.partial(self._collected, key))
+        self._trim()
+
+    def setMaxSize(self, maxSize):
+        self.maxSize = maxSize
+        self._trim()
+
+    def clear(self):
+        self.evictions += len(self._entries)
+        self._entries.clear()
+
+    def _trim(self):
+        if self.maxSize is None:
+            return
+        while len(self._entries) > self.maxSize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _collected(self, key, ref):
+        if self._entries.get(key) is ref:
+            del self._entries[key]
+
+    def _nodeRemoved(self, node, *args):
+        if self._entries.pop(MObjectHandle(node).hashCode(), None) is not None:
+            self.evictions += 1
+
+    def _sceneChanged(self, *args):
+        self.clear()
+
+    def _installCallbacks(self):
+        self._callbackIds = []
+        # noinspection PyBroadException
+        try:
+            self._callbackIds.append(MDGMessage.addNodeRemovedCallback(self._nodeRemoved, 'dependNode'))
+            self._callbackIds.append(MSceneMessage.addCallback(MSceneMessage.kBeforeNew, self._sceneChanged))
+            self._callbackIds.append(MSceneMessage.addCallback(MSceneMessage.kBeforeOpen, self._sceneChanged))
+        except:
+            if _debug:
+                warnings.warn('Could not install the node pool callbacks, entries will only be dropped when collected')
+        _setCallbacks('nodePool', self._callbackIds)
 
 
 class DependNode(object):
@@ -639,7 +1826,7 @@ class DependNode(object):
     never invalidate your DependNode instance.
     """
 
-    _instances = {}  # not sure if more efficient, but let's do some object pooling by UUID
+    _instances = _NodePool()  # object pooling by MObjectHandle hash
     _MFnDependencyNode = MFnDependencyNode()  # I don't want to create new objects every time we get the name
     _apiObjectHelper = _oldMSelectionList()
 
@@ -647,38 +1834,58 @@ class DependNode(object):
     def fnInstance():
         return DependNode._MFnDependencyNode
 
+    @staticmethod
+    def poolStats():
+        # size, hits, misses and evictions of the instance pool
+        return DependNode._instances.stats()
+
+    @staticmethod
+    def setPoolSize(maxSize):
+        # None means unbounded, otherwise the least recently used instances are dropped from the pool first
+        DependNode._instances.setMaxSize(maxSize)
+
     @classmethod
-    def pool(cls, nodeName, nodeType):
-        # Using internal Maya cmds to avoid recursive calls (wrapped cmds.ls() constructs DependNode objects when necessary)
-        key = _cmds.ls(nodeName, uuid=True)[0]
-        if ":" in nodeName:
-            key = list(filter(None, nodeName.split(":", 1)))[0] + key
-        inst = DependNode._instances.get(key, None)
-        if inst is None:
-            inst = cls(nodeName, nodeType)
-            DependNode._instances[key] = inst
+    def pool(cls, nodeName, nodeType, mobject=None, dagPath=None):
+        # The pool is keyed on the MObjectHandle hash of the node, pass the mobject (and dagPath) when they are known
+        # to skip the name lookup. Hashes can be reused after a node is deleted, so hits are checked against the MObject.
+        if mobject is None:
+            mobject, dagPath = _resolveNode(nodeName)
+        key = MObjectHandle(mobject).hashCode()
+        inst = DependNode._instances.get(key)
+        if inst is None or inst.asMObject() != mobject:
+            inst = cls(nodeName, nodeType, mobject, dagPath)
+            DependNode._instances.add(key, inst)
         elif not inst.valid():
-            inst.updateHandle(nodeName)
+            inst.updateHandle(nodeName, mobject, dagPath)
         return inst
 
-    def __init__(self, nodeName, nodeType):
-        assert isinstance(nodeName, basestring)
+    def __init__(self, nodeName, nodeType, mobject=None, dagPath=None):
+        assert mobject is not None or isinstance(nodeName, basestring)
+        if _nameCallbackIds is None:
+            _installNameCallbacks()
         self.__type = nodeType
-        # Using internal Maya cmds to avoid recursive calls (wrapped cmds.ls() constructs DependNode objects when necessary)
         self.__handle = None
-        self.updateHandle(nodeName)
+        self.__objectHandle = None
+        self.updateHandle(nodeName, mobject, dagPath)
 
     def valid(self):
+        if not self.__objectHandle.isValid():
+            return False
         if isinstance(self.__handle, MDagPath):
             return self.__handle.isValid()
-        return self.__handle.isNull()
+        return True
 
-    def updateHandle(self, nodeName):
-        if _cmds.ls(nodeName, l=True)[0][0] == '|':
-            self.__handle = _getMDagPath(nodeName)
+    def updateHandle(self, nodeName, mobject=None, dagPath=None):
+        if mobject is None:
+            mobject, dagPath = _resolveNode(nodeName)
+        self.__objectHandle = MObjectHandle(mobject)
+        self.__name = None
+        self.__nameGeneration = -1
+        if mobject.hasFn(MFn.kDagNode):
+            self.__handle = dagPath if dagPath is not None else MDagPath.getAPathTo(mobject)
             assert self.__handle.isValid()
         else:
-            self.__handle = _getMObject(nodeName)
+            self.__handle = mobject
 
     def __len__(self):
         return len(str(self))
@@ -691,7 +1898,16 @@ class DependNode(object):
         return o
 
     def delete(self, constructionHistory=False):
-        cmds.delete(self._nodeName, ch=constructionHistory)
+        if _activeBatch is None:
+            cmds.delete(self._nodeName, ch=constructionHistory)
+            return
+        if constructionHistory:
+            # there is no modifier operation for this, so it is queued as a command that runs in order
+            _queueCommand(lambda: _cmds.delete(str(self), ch=True))
+            return
+        # operations on the node that are still queued must be executed before it can be deleted
+        _activeBatch.doIt()
+        _activeBatch.modifier(dag=isinstance(self, DagNode) or None).deleteNode(self.asMObject())
 
     def name(self):
         return self._nodeName.rsplit('|', 1)[-1]
@@ -701,23 +1917,40 @@ class DependNode(object):
 
     @property
     def _nodeName(self):
+        # cached until any node is renamed or reparented, see _namesChanged
+        if self.__nameGeneration == _nameGeneration:
+            return self.__name
         if isinstance(self.__handle, MDagPath):
-            return self.__handle.fullPathName()
-        if self.__handle is None:
+            name = self.__handle.fullPathName()
+        elif self.__handle is None:
             return ''
-        self._MFnDependencyNode.setObject(self.__handle)
-        return self._MFnDependencyNode.name()
+        else:
+            self._MFnDependencyNode.setObject(self.__handle)
+            name = self._MFnDependencyNode.name()
+        if _nameCallbackIds:
+            self.__name = name
+            self.__nameGeneration = _nameGeneration
+        return name
 
     def __eq__(self, other):
+        # identity of the underlying node (and dag path, to tell instances apart), so renames don't matter
         if isinstance(other, DependNode):
-            return self._nodeName == other._nodeName
+            if isinstance(self.__handle, MDagPath) and isinstance(other.__handle, MDagPath):
+                return self.__handle == other.__handle
+            return self.__objectHandle == other.__objectHandle
         return False
 
+    def __ne__(self, other):
+        return not (self == other)
+
     def __hash__(self):
-        return self._nodeName.__hash__()
+        return self.__objectHandle.hashCode()
 
     def rename(self, newName):
-        cmds.rename(self._nodeName, newName)
+        if _activeBatch is None:
+            cmds.rename(self._nodeName, newName)
+            return
+        _activeBatch.modifier().renameNode(self.asMObject(), newName)
 
     def hasAttr(self, attr):
         return cmds.objExists(self._nodeName + '.' + attr)
@@ -734,14 +1967,10 @@ class DependNode(object):
     def __setstate__(self, inSettings):
         inType, inNodeName = inSettings
         self.__type = inType
-        if _cmds.ls(inNodeName, l=True)[0][0] == '|':
-            self.__handle = _getMDagPath(inNodeName)
-            assert self.__handle.isValid()
-        else:
-            self.__handle = _getMObject(inNodeName)
+        self.updateHandle(inNodeName)
 
     def __getattr__(self, attr):
-        return _Attribute(self._nodeName + '.' + attr)
+        return _Attribute(self._nodeName + '.' + attr, self.type())
 
     def __setattr__(self, attr, value):
         if attr.startswith('_DependNode__'):
@@ -777,7 +2006,7 @@ class DependNode(object):
             cmds.deleteAttr(self._nodeName, at=attrName)
 
     def plugs(self, ud=False):
-        return [_Attribute(self._nodeName + '.' + attr) for attr in (_cmds.listAttr(self._nodeName, ud=ud) or [])]
+        return [_Attribute(self._nodeName + '.' + attr, self.type()) for attr in (_cmds.listAttr(self._nodeName, ud=ud) or [])]
 
     def isShape(self):
         return self.asMObject().hasFn(MFn.kShape)
@@ -788,8 +2017,28 @@ class DependNode(object):
     def customPlugs(self):
         return [self.plug(attr) for attr in (cmds.listAttr(self._nodeName, ud=1) or [])]
 
-    def asMObject(self):  # TODO: Refactor this away by making getMObject public
-        return _getMObject(self._nodeName)
+    def upstream(self, types=None, match=None, maxDepth=None, prune=None, plugs=False, raw=False, breadthFirst=False):
+        """
+        Lazily yield the nodes feeding into this one, nearest first along each branch, through MItDependencyGraph.
+        types (MFn types) and match(item) filter what is yielded, maxDepth limits how many connections are followed
+        and prune(item) returning True stops the walk past an item.
+        plugs yields the plugs connections arrive at instead of nodes, raw yields MObjects / MPlugs without wrapping.
+        """
+        return _walkGraph(self.asMObject(), False, types, match, maxDepth, prune, plugs, raw, breadthFirst)
+
+    def downstream(self, types=None, match=None, maxDepth=None, prune=None, plugs=False, raw=False,
+                   breadthFirst=False):
+        # lazily yield the nodes this one feeds into, see upstream
+        return _walkGraph(self.asMObject(), True, types, match, maxDepth, prune, plugs, raw, breadthFirst)
+
+    def asMObject(self):
+        if isinstance(self.__handle, MDagPath):
+            return self.__handle.node()
+        return MObject(self.__handle)
+
+    def _handle(self):
+        # the cached MDagPath of dag nodes or MObject of other nodes, not a copy so callers must not modify it
+        return self.__handle
 
 
 class DagNode(DependNode):
@@ -815,6 +2064,10 @@ class DagNode(DependNode):
         return self._nodeName.rsplit('|', 1)[-1]
 
     def asDagPath(self):
+        # a copy of the cached path, so callers can't modify our handle
+        handle = self._handle()
+        if isinstance(handle, MDagPath):
+            return MDagPath(handle)
         return _getMDagPath(self._nodeName)
 
 
@@ -846,6 +2099,10 @@ class Transform(DagNode):
     def allDescendants(self):
         return cmds.listRelatives(self._nodeName, ad=True, f=True) or []
 
+    def walk(self, breadthFirst=False, types=None, maxDepth=None, prune=None, raw=False):
+        # lazily yields the nodes below this one, see the module level walk()
+        return walk(self, breadthFirst, types, maxDepth, prune, raw)
+
     def numChildren(self):
         return len(self._children())
 
@@ -869,8 +2126,8 @@ class Transform(DagNode):
 
     def __getattr__(self, attr):
         if attr == 'rotate':
-            return _Transform_Rotate_Attribute(self._nodeName + '.' + attr)
-        return _Attribute(self._nodeName + '.' + attr)
+            return _Transform_Rotate_Attribute(self._nodeName + '.' + attr, self.type())
+        return _Attribute(self._nodeName + '.' + attr, self.type())
 
 
 class Joint(Transform):
@@ -888,48 +2145,414 @@ class Joint(Transform):
         cmds.setAttr(self._nodeName + '.jointOrient', *m.asDegrees(), type='double3')
 
 
+_spaces = {'object': MSpace.kObject, 'world': MSpace.kWorld}
+
+
+def _space(space):
+    if space not in _spaces:
+        raise ValueError("space must be 'object' or 'world', not %r" % space)
+    return _spaces[space]
+
+
 class Shape(DagNode):
     # Note the base class implements __setattr__, so we should not introduce new member variables, only functions.
-    pass
+    def _geometry(self):
+        # (function set, points getter, points setter) for meshes, nurbs curves and nurbs surfaces
+        dagPath = self.asDagPath()
+        if dagPath.hasFn(MFn.kMesh):
+            fn = MFnMesh(dagPath)
+            return fn, fn.getPoints, fn.setPoints
+        if dagPath.hasFn(MFn.kNurbsCurve):
+            fn = MFnNurbsCurve(dagPath)
+            return fn, fn.cvPositions, lambda points, space: (fn.setCVPositions(points, space), fn.updateCurve())
+        if dagPath.hasFn(MFn.kNurbsSurface):
+            fn = MFnNurbsSurface(dagPath)
+            return fn, fn.cvPositions, lambda points, space: (fn.setCVPositions(points, space), fn.updateSurface())
+        raise ValueError('%s is not a mesh, nurbsCurve or nurbsSurface' % self._nodeName)
+
+    def _mesh(self):
+        fn = self._geometry()[0]
+        if not isinstance(fn, MFnMesh):
+            raise ValueError('%s is not a mesh' % self._nodeName)
+        return fn
+
+    def getPoints(self, space='object'):
+        # vertex or cv positions as an (N, 3) numpy array in internal units, nurbs surface cvs are u major
+        _requireNumpy()
+        fn, getPoints, setPoints = self._geometry()
+        return _np.array(getPoints(_space(space)), dtype=float).reshape(-1, 4)[:, :3].copy()
+
+    def setPoints(self, points, space='object'):
+        """
+        Set all vertex or cv positions from an (N, 3) array in internal units as one undoable step.
+        Shapes with construction history get their points overwritten again on the next evaluation.
+        """
+        _requireNumpy()
+        fn, getPoints, setPoints = self._geometry()
+        space = _space(space)
+        points = _np.asarray(points, dtype=float).reshape(-1, 3)
+        previous = getPoints(MSpace.kObject)
+        if len(points) != len(previous):
+            raise ValueError('%s has %i points, got %i' % (self._nodeName, len(previous), len(points)))
+        new = MPointArray([MPoint(x, y, z) for x, y, z in points.tolist()])
+        with batch() as current:
+            current.run(_Operation(lambda: setPoints(new, space), lambda: setPoints(previous, MSpace.kObject)))
+
+    def getNormals(self, space='object', perVertex=True):
+        # mesh normals as an (N, 3) numpy array, per vertex or per normal id (see MFnMesh.getNormals)
+        _requireNumpy()
+        fn = self._mesh()
+        normals = fn.getVertexNormals(False, _space(space)) if perVertex else fn.getNormals(_space(space))
+        return _np.array(normals, dtype=float).reshape(-1, 3)
+
+    def getUVs(self, uvSet=None):
+        # mesh uvs of the current (or the given) uv set as an (N, 2) numpy array
+        _requireNumpy()
+        fn = self._mesh()
+        u, v = fn.getUVs(uvSet) if uvSet else fn.getUVs()
+        return _np.column_stack((_np.array(u, dtype=float), _np.array(v, dtype=float)))
+
+
+def _allComponents(shapePath):
+    # (component covering every point of the shape, number of points)
+    if shapePath.hasFn(MFn.kMesh):
+        count = MFnMesh(shapePath).numVertices
+        fn, component = MFnSingleIndexedComponent(), MFn.kMeshVertComponent
+    elif shapePath.hasFn(MFn.kNurbsCurve):
+        count = MFnNurbsCurve(shapePath).numCVs
+        fn, component = MFnSingleIndexedComponent(), MFn.kCurveCVComponent
+    elif shapePath.hasFn(MFn.kNurbsSurface):
+        surface = MFnNurbsSurface(shapePath)
+        fn = MFnDoubleIndexedComponent()
+        components = fn.create(MFn.kSurfaceCVComponent)
+        fn.setCompleteData(surface.numCVsInU, surface.numCVsInV)
+        return components, surface.numCVsInU * surface.numCVsInV
+    else:
+        raise ValueError('%s is not a mesh, nurbsCurve or nurbsSurface' % shapePath.fullPathName())
+    components = fn.create(component)
+    fn.setCompleteData(count)
+    return components, count
+
+
+def _influenceKey(name):
+    # influence name without its path and namespace, to match influences between scenes
+    return name.rsplit('|', 1)[-1].rsplit(':', 1)[-1]
+
+
+class SkinWeights(object):
+    """
+    Skin weights of N points over named influences in compressed sparse row form:
+    point i has weights[indptr[i]:indptr[i + 1]] for the influences at indices[indptr[i]:indptr[i + 1]].
+    """
+
+    def __init__(self, influences, indptr, indices, weights):
+        _requireNumpy()
+        self.influences = list(influences)
+        self.indptr = _np.asarray(indptr, dtype=_np.int64)
+        self.indices = _np.asarray(indices, dtype=_np.int32)
+        self.weights = _np.asarray(weights, dtype=float)
+
+    @classmethod
+    def fromDense(cls, influences, dense, threshold=0.0):
+        # (points, influences) array, weights at or below threshold are dropped
+        _requireNumpy()
+        dense = _np.asarray(dense, dtype=float).reshape(-1, len(influences))
+        mask = _np.abs(dense) > threshold
+        indptr = _np.concatenate(([0], _np.cumsum(mask.sum(axis=1))))
+        return cls(influences, indptr, _np.nonzero(mask)[1], dense[mask])
+
+    def toDense(self):
+        dense = _np.zeros((len(self), len(self.influences)))
+        rows = _np.repeat(_np.arange(len(self)), _np.diff(self.indptr))
+        dense[rows, self.indices] = self.weights
+        return dense
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def save(self, path):
+        # numpy .npz file, numpy adds the extension when it is missing
+        _np.savez_compressed(path, influences=_np.array(self.influences, dtype=str), indptr=self.indptr,
+                             indices=self.indices, weights=self.weights)
+
+    @classmethod
+    def load(cls, path):
+        _requireNumpy()
+        data = _np.load(path, allow_pickle=False)
+        return cls([str(name) for name in data['influences']], data['indptr'], data['indices'], data['weights'])
+
+
+class SkinCluster(DependNode):
+    # Note the base class implements __setattr__, so we should not introduce new member variables, only functions.
+    def _fn(self):
+        return MFnSkinCluster(self.asMObject())
+
+    def _shapePath(self, fn):
+        return fn.getPathAtIndex(fn.indexForOutputConnection(0))
+
+    def influences(self):
+        return [_wrapMObject(path.node(), path) for path in self._fn().influenceObjects()]
+
+    def influenceNames(self):
+        return [path.partialPathName() for path in self._fn().influenceObjects()]
+
+    def geometry(self):
+        path = self._shapePath(self._fn())
+        return _wrapMObject(path.node(), path)
+
+    def getWeights(self, threshold=0.0):
+        # all weights in one MFnSkinCluster call, as SkinWeights
+        _requireNumpy()
+        fn = self._fn()
+        shapePath = self._shapePath(fn)
+        components, count = _allComponents(shapePath)
+        weights, influenceCount = fn.getWeights(shapePath, components)
+        names = [path.partialPathName() for path in fn.influenceObjects()]
+        return SkinWeights.fromDense(names, _np.array(weights, dtype=float).reshape(count, influenceCount), threshold)
+
+    def setWeights(self, weights, normalize=False, mapping=None):
+        """
+        Replace all weights from SkinWeights in one undoable step.
+        Influences are matched by name: mapping (saved name -> scene name) first, then the exact name,
+        then the name without path and namespace. Influences of this skinCluster that are not in weights get 0.
+        """
+        _requireNumpy()
+        fn = self._fn()
+        shapePath = self._shapePath(fn)
+        components, count = _allComponents(shapePath)
+        if len(weights) != count:
+            raise ValueError('%s has %i points, the weights are for %i' % (shapePath.partialPathName(), count, len(weights)))
+
+        names = [path.partialPathName() for path in fn.influenceObjects()]
+        exact = dict((name, i) for i, name in enumerate(names))
+        keys = {}
+        for i, name in enumerate(names):
+            keys.setdefault(_influenceKey(name), []).append(i)
+        columns, missing = [], []
+        for name in weights.influences:
+            name = (mapping or {}).get(name, name)
+            column = exact.get(name)
+            if column is None and len(keys.get(_influenceKey(name), ())) == 1:
+                column = keys[_influenceKey(name)][0]
+            if column is None:
+                missing.append(name)
+            columns.append(column)
+        if missing:
+            raise ValueError('%s has no influences matching %s' % (self._nodeName, ', '.join(missing)))
+
+        dense = _np.zeros((count, len(names)))
+        rows = _np.repeat(_np.arange(count), _np.diff(weights.indptr))
+        _np.add.at(dense, (rows, _np.array(columns, dtype=int)[weights.indices]), weights.weights)
+        influenceIndices = MIntArray(list(range(len(names))))
+        newWeights = MDoubleArray(dense.ravel().tolist())
+        previous = {}
+
+        def doIt():
+            previous['weights'] = fn.setWeights(shapePath, components, influenceIndices, newWeights, normalize, True)
+
+        def undoIt():
+            fn.setWeights(shapePath, components, influenceIndices, previous['weights'], False)
+
+        with batch() as current:
+            current.run(_Operation(doIt, undoIt))
+
+    def exportWeights(self, path, threshold=0.0):
+        self.getWeights(threshold).save(path)
+
+    def importWeights(self, path, normalize=False, mapping=None):
+        self.setWeights(SkinWeights.load(path), normalize, mapping)
+
+
+class AnimCurve(DependNode):
+    # Note the base class implements __setattr__, so we should not introduce new member variables, only functions.
+    def _fn(self):
+        return MFnAnimCurve(self.asMObject())
+
+    def _valueScale(self, fn):
+        # internal value * scale = value in UI units, like cmds.keyframe returns them
+        curveType = fn.animCurveType
+        if curveType in (MFnAnimCurve.kAnimCurveTA, MFnAnimCurve.kAnimCurveUA):
+            return MAngle(1.0).asUnits(MAngle.uiUnit())
+        if curveType in (MFnAnimCurve.kAnimCurveTL, MFnAnimCurve.kAnimCurveUL):
+            return MDistance(1.0).asUnits(MDistance.uiUnit())
+        return 1.0
+
+    def numKeys(self):
+        return self._fn().numKeys
+
+    def getKeys(self):
+        """
+        All keys in one pass, returns a dict of numpy arrays (lists when numpy is not available):
+        times (UI time unit, or the unitless input of driven keys), values (UI units),
+        inTangentTypes, outTangentTypes, inAngles, outAngles (degrees), inWeights and outWeights.
+        """
+        fn = self._fn()
+        count = fn.numKeys
+        scale = self._valueScale(fn)
+        if fn.isUnitlessInput:
+            times = [fn.unitlessInput(i) for i in range(count)]
+        else:
+            unit = MTime.uiUnit()
+            times = [fn.input(i).asUnits(unit) for i in range(count)]
+        keys = OrderedDict((('times', times), ('values', [fn.value(i) * scale for i in range(count)]),
+                            ('inTangentTypes', [fn.inTangentType(i) for i in range(count)]),
+                            ('outTangentTypes', [fn.outTangentType(i) for i in range(count)])))
+        for side, isInTangent in (('in', True), ('out', False)):
+            angles, weights = [], []
+            for i in range(count):
+                angle, weight = fn.getTangentAngleWeight(i, isInTangent)
+                angles.append(angle.asDegrees())
+                weights.append(weight)
+            keys[side + 'Angles'], keys[side + 'Weights'] = angles, weights
+        if _np is not None:
+            for name, values in keys.items():
+                keys[name] = _np.array(values, dtype=int if name.endswith('Types') else float)
+        return keys
+
+    def setKeys(self, times, values, inTangentTypes=MFnAnimCurve.kTangentAuto,
+                outTangentTypes=MFnAnimCurve.kTangentAuto, inAngles=None, outAngles=None, inWeights=None,
+                outWeights=None, weighted=None):
+        """
+        Replace all keys in one undoable step, takes the arrays getKeys() returns.
+        Tangent types are one type for all keys or one per key, angles (degrees) and weights are optional.
+        weighted=None keeps the curve's weighted tangents setting, weights are only applied to weighted curves.
+        """
+        fn = self._fn()
+        scale = self._valueScale(fn)
+        times = [float(t) for t in times]
+        values = [float(v) / scale for v in values]
+        if len(times) != len(values):
+            raise ValueError('got %i values for %i times' % (len(values), len(times)))
+        count = len(times)
+        perKey = [(inTangentTypes, 'inTangentTypes'), (outTangentTypes, 'outTangentTypes'), (inAngles, 'inAngles'),
+                  (outAngles, 'outAngles'), (inWeights, 'inWeights'), (outWeights, 'outWeights')]
+        for keyValues, name in perKey:
+            if keyValues is not None and hasattr(keyValues, '__len__') and len(keyValues) != count:
+                raise ValueError('got %i %s for %i keys' % (len(keyValues), name, count))
+        inTypes = list(inTangentTypes) if hasattr(inTangentTypes, '__len__') else [inTangentTypes] * count
+        outTypes = list(outTangentTypes) if hasattr(outTangentTypes, '__len__') else [outTangentTypes] * count
+        change = MAnimCurveChange()
+        state = {'done': False}
+
+        def apply():
+            for i in reversed(range(fn.numKeys)):
+                fn.remove(i, change)
+            if fn.isUnitlessInput:
+                for i in range(count):
+                    fn.addKey(times[i], values[i], int(inTypes[i]), int(outTypes[i]), change)
+            elif count:
+                unit = MTime.uiUnit()
+                fn.addKeys(MTimeArray([MTime(t, unit) for t in times]), MDoubleArray(values),
+                           int(inTypes[0]), int(outTypes[0]), False, change)
+                for i in range(count):
+                    if inTypes[i] != inTypes[0]:
+                        fn.setInTangentType(i, int(inTypes[i]), change)
+                    if outTypes[i] != outTypes[0]:
+                        fn.setOutTangentType(i, int(outTypes[i]), change)
+            if weighted is not None and bool(weighted) != fn.isWeighted:
+                fn.setIsWeighted(bool(weighted), change)
+            isWeighted = fn.isWeighted
+            for i in range(count):
+                for angles, weights, isInTangent in ((inAngles, inWeights, True), (outAngles, outWeights, False)):
+                    if angles is not None:
+                        fn.setAngle(i, MAngle(float(angles[i]), MAngle.kDegrees), isInTangent, change)
+                    if weights is not None and isWeighted:
+                        fn.setWeight(i, float(weights[i]), isInTangent, change)
+
+        def doIt():
+            if state['done']:
+                change.redoIt()
+            else:
+                apply()
+                state['done'] = True
+
+        with batch() as current:
+            current.run(_Operation(doIt, change.undoIt))
+
+
+def _wrapMObject(mobject, dagPath=None):
+    # classifies and pools an already resolved node, without any name lookups
+    _type = DependNode
+    if mobject.hasFn(MFn.kShape):
+        _type = Shape
+    elif mobject.hasFn(MFn.kJoint):
+        _type = Joint
+    elif mobject.hasFn(MFn.kTransform):
+        _type = Transform
+    elif mobject.hasFn(MFn.kSkinClusterFilter):
+        _type = SkinCluster
+    elif mobject.hasFn(MFn.kAnimCurve):
+        _type = AnimCurve
+
+    fn = DependNode.fnInstance()
+    fn.setObject(mobject)
+    return _type.pool(None, fn.typeName, mobject, dagPath)
 
 
 def wrapNode(nodeName):
+    if isinstance(nodeName, (DependNode, _Attribute)):
+        return nodeName
     if isinstance(nodeName, basestring) and '.' in nodeName:
         nodeName, suffix = nodeName.split('.', 1)
         result = wrapNode(nodeName)
         if result is None:
             return None
         return getattr(result, suffix)
-    if not cmds.objExists(nodeName):
+
+    # a single selection list lookup tells us whether the node exists and gives us all handles we need
+    selectionList = MSelectionList()
+    try:
+        selectionList.add(nodeName)
+    except (RuntimeError, TypeError):
         return None
-    nodeType = _cmds.nodeType(nodeName)
+    if selectionList.isEmpty():
+        return None
+    _mobj = selectionList.getDependNode(0)
+    _dagPath = selectionList.getDagPath(0) if _mobj.hasFn(MFn.kDagNode) else None
+    return _wrapMObject(_mobj, _dagPath)
 
-    _mobj = MGlobal.getSelectionListByName(nodeName).getDependNode(0)
 
-    _type = DependNode
-    if _mobj.hasFn(MFn.kShape):
-        _type = Shape
-    elif _mobj.hasFn(MFn.kJoint):
-        _type = Joint
-    elif _mobj.hasFn(MFn.kTransform):
-        _type = Transform
+def _wrapNodes(nodeNames):
+    # wrapNode for many names at once: all names go into one selection list and are classified in one loop,
+    # names that do not exist become None, plugs, components and ambiguous names go through wrapNode one by one
+    selectionList = MSelectionList()
+    indices = []
+    for nodeName in nodeNames:
+        if not isinstance(nodeName, basestring) or '.' in nodeName:
+            indices.append(-1)
+            continue
+        count = selectionList.length()
+        try:
+            selectionList.add(nodeName)
+        except RuntimeError:
+            indices.append(None)
+            continue
+        indices.append(count if selectionList.length() == count + 1 else -1)
 
-    return _type.pool(nodeName, nodeType)
+    wrapped = []
+    for nodeName, index in zip(nodeNames, indices):
+        if index is None:
+            wrapped.append(None)
+        elif index == -1:
+            wrapped.append(wrapNode(nodeName))
+        else:
+            mobject = selectionList.getDependNode(index)
+            dagPath = selectionList.getDagPath(index) if mobject.hasFn(MFn.kDagNode) else None
+            wrapped.append(_wrapMObject(mobject, dagPath))
+    return wrapped
 
 
 def createNode(nodeType):
     # Api with undo/redo support, we profiled this to be faster than cmds.createNode:
-    # noinspection PyBroadException
-    try:
-        mod = MDGModifier()
-        obj = mod.createNode(nodeType)
-    except:
-        mod = MDagModifier()
-        obj = mod.createNode(nodeType)
-    mod.doIt()
-    DependNode.fnInstance().setObject(obj)
-    node = DependNode.fnInstance().name()
-    return wrapNode(node)
+    with batch() as current:
+        # noinspection PyBroadException
+        try:
+            obj = current.modifier(dag=False).createNode(nodeType)
+        except:
+            obj = current.modifier(dag=True).createNode(nodeType)
+        # the node must exist before we can wrap it
+        current.doIt()
+    return _wrapMObject(obj)
 
 
 def _isStringOrStringList(inObject):
@@ -952,6 +2575,10 @@ def getNode(nodeName=None):
             return curSelection[0]
         return curSelection
 
+    # nodes and attributes that are already wrapped, like the results of the wrapped cmds, pass through as is
+    if isinstance(nodeName, (DependNode, _Attribute)):
+        return nodeName
+
     nodeNames = []
     _singleNode = False
     if isinstance(nodeName, basestring):
@@ -961,16 +2588,13 @@ def getNode(nodeName=None):
         nodeFn = MFnDependencyNode(nodeName)
         nodeNames = [nodeFn.name()]
         _singleNode = True
-    elif _isStringOrStringList(nodeName):
+    elif isinstance(nodeName, (list, tuple)) and all(isinstance(elem, (basestring, DependNode, _Attribute))
+                                                     for elem in nodeName):
         nodeNames = nodeName
 
-    wrapped = []
-    for nodeName in nodeNames:
-        wrapped.append(wrapNode(nodeName))
-
     if _singleNode:
-        return wrapped[0]
-    return wrapped
+        return wrapNode(nodeNames[0])
+    return _wrapNodes(nodeNames)
 
 
 def selection():
@@ -978,6 +2602,300 @@ def selection():
     return getNode()
 
 
+def _isNumeric(value):
+    if isinstance(value, (bool, int, float)):
+        return True
+    if isinstance(value, tuple):
+        return all(isinstance(e, (bool, int, float)) for e in value)
+    return isinstance(value, MMatrix)
+
+
+def _column(values):
+    # numeric columns become numpy arrays: (N,) for scalars, (N, k) for compounds, (N, 4, 4) for matrices
+    if _np is None or not values or not all(_isNumeric(value) for value in values):
+        return values
+    if isinstance(values[0], MMatrix):
+        return _np.array([tuple(m) for m in values], dtype=float).reshape(-1, 4, 4)
+    return _np.array(values)
+
+
+def getAttrs(nodes, attrs, wrap=False):
+    """
+    Read the same attributes from many nodes in one pass.
+
+    All plugs are resolved through a single MSelectionList and read with typed plug accessors,
+    anything those do not support is read through _Attribute instead.
+    Returns a dict of attribute name -> column of values in the order of nodes.
+    Numeric and compound numeric columns are numpy arrays (when numpy is available), other columns are lists.
+    When wrap is True every column is a list of math wrapped values (Vector, Matrix, ...) like _Attribute.get() returns.
+    Values of plugs that do not exist are None.
+    """
+    names = [str(node) for node in nodes]
+    selectionList = MSelectionList()
+    indices = []
+    for name in names:
+        for attr in attrs:
+            count = selectionList.length()
+            # noinspection PyBroadException
+            try:
+                selectionList.add(name + '.' + attr)
+            except:
+                indices.append(None)
+                continue
+            # paths that do not resolve to exactly one new plug are read through _Attribute instead
+            indices.append(count if selectionList.length() == count + 1 else -1)
+
+    result = {}
+    for column, attr in enumerate(attrs):
+        values = []
+        attrObject, reader = None, None
+        for row, name in enumerate(names):
+            index = indices[row * len(attrs) + column]
+            if index is None:
+                values.append(None)
+                continue
+            plug = None
+            if index != -1:
+                try:
+                    plug = selectionList.getPlug(index)
+                except RuntimeError:
+                    pass  # components and other non-plug matches
+            if plug is None:
+                values.append(_Attribute(name + '.' + attr)._value())
+                continue
+            attribute = plug.attribute()
+            if attrObject is None or attribute != attrObject:
+                attrObject, reader = attribute, _plugReader(plug)
+            values.append(reader(plug) if reader is not None else _Attribute(name + '.' + attr)._value())
+        result[attr] = [_wrapMathObjects(value) for value in values] if wrap else _column(values)
+    return result
+
+
+def sampleAttrs(attrs, frames):
+    """
+    Evaluate many plugs over frames (in the UI time unit) through an MDGContext, without changing the current time.
+    attrs are _Attributes or 'node.attr' paths, returns a list with a (F, ...) array per attribute in UI units:
+    (F,) for scalars, (F, k) for compounds and (F, 4, 4) for matrices such as worldMatrix[0].
+    Uses MDGContext.makeCurrent, so it needs Maya 2018 or newer.
+    """
+    plugs, readers = [], []
+    for attr in attrs:
+        plug = _asMPlug(attr)
+        reader = _plugReader(plug)
+        if reader is None:
+            raise ValueError('%s can not be sampled, it is an array or an unsupported attribute type' % attr)
+        plugs.append(plug)
+        readers.append(reader)
+
+    unit = MTime.uiUnit()
+    samples = [[] for _ in plugs]
+    for frame in frames:
+        previous = MDGContext(MTime(float(frame), unit)).makeCurrent()
+        try:
+            for values, plug, reader in zip(samples, plugs, readers):
+                values.append(reader(plug))
+        finally:
+            previous.makeCurrent()
+    return [_column(values) for values in samples]
+
+
+def _plugs(nodes, attrs):
+    # the plugs of attrs on every node, resolved through one selection list, attributes a node lacks are skipped
+    selectionList = MSelectionList()
+    for node in nodes:
+        name = str(node)
+        for attr in attrs:
+            # noinspection PyBroadException
+            try:
+                selectionList.add(name + '.' + attr)
+            except:
+                pass
+    plugs = []
+    for i in range(selectionList.length()):
+        try:
+            plugs.append(selectionList.getPlug(i))
+        except RuntimeError:
+            pass  # components and other non-plug matches
+    return plugs
+
+
+def lockAttrs(nodes, attrs, lock=True, leaf=False):
+    """
+    Lock (or unlock) attrs on all nodes in one undoable step, working on the plugs directly.
+    leaf also does all children of compounds, so lockAttrs(nodes, ['t', 'r', 's'], leaf=True) locks all nine channels.
+    """
+    _setPlugFlag(_plugsAndDescendants(_plugs(nodes, attrs), leaf), 'isLocked', lock)
+
+
+def keyableAttrs(nodes, attrs, keyable=True, leaf=False):
+    # like lockAttrs, for the keyable state
+    _setPlugFlag(_plugsAndDescendants(_plugs(nodes, attrs), leaf), 'isKeyable', keyable)
+
+
+def channelBoxAttrs(nodes, attrs, channelBox=True, leaf=False):
+    # like lockAttrs, for showing non keyable attributes in the channel box
+    _setPlugFlag(_plugsAndDescendants(_plugs(nodes, attrs), leaf), 'isChannelBox', channelBox)
+
+
+def _dagPaths(nodes):
+    # the cached dag paths of wrapped nodes, names are wrapped in bulk, the paths are not copied so don't modify them
+    nodes = list(nodes)
+    names = [node for node in nodes if not isinstance(node, DependNode)]
+    wrapped = iter(_wrapNodes(names)) if names else None
+    paths = []
+    for node in nodes:
+        source = node
+        if not isinstance(node, DependNode):
+            node = next(wrapped)
+        handle = node._handle() if isinstance(node, DagNode) else None
+        if not isinstance(handle, MDagPath):
+            raise ValueError('%s is not an existing dag node' % source)
+        paths.append(handle)
+    return paths
+
+
+_matrixSpaces = {
+    'world': MDagPath.inclusiveMatrix,
+    'worldInverse': MDagPath.inclusiveMatrixInverse,
+    'parent': MDagPath.exclusiveMatrix,
+    'parentInverse': MDagPath.exclusiveMatrixInverse,
+    'local': lambda dagPath: dagPath.inclusiveMatrix() * dagPath.exclusiveMatrixInverse(),
+}
+
+
+def getMatrices(nodes, space='world'):
+    """
+    Read the matrices of many dag nodes in one pass, returns an (N, 4, 4) numpy array in internal units.
+    space is one of 'world', 'worldInverse', 'local', 'parent' or 'parentInverse'.
+    Nodes can be wrapped nodes or names, wrapped nodes reuse their cached dag paths so nothing is looked up by name.
+    """
+    _requireNumpy()
+    if space not in _matrixSpaces:
+        raise ValueError('space must be one of %s, not %r' % (', '.join(sorted(_matrixSpaces)), space))
+    read = _matrixSpaces[space]
+    matrices = [tuple(read(dagPath)) for dagPath in _dagPaths(nodes)]
+    return _np.array(matrices, dtype=float).reshape(-1, 4, 4)
+
+
+def getTranslations(nodes, space='world'):
+    # the translation rows of getMatrices(), an (N, 3) numpy array
+    return _np.ascontiguousarray(getMatrices(nodes, space)[:, 3, :3])
+
+
+_nodeClassAttributes = {}  # (node type, attribute name) -> attribute MObject
+
+
+def _nodeClassAttribute(nodeType, name):
+    # static attribute objects are shared by every node of a type, so plugs can be built without name lookups
+    key = (nodeType, name)
+    attribute = _nodeClassAttributes.get(key)
+    if attribute is None:
+        attribute = _nodeClassAttributes[key] = MNodeClass(nodeType).attribute(name)
+    return attribute
+
+
+def _isSettable(plug):
+    # locked or driven plugs (or compound parents) do not take new values
+    while True:
+        if plug.isLocked or plug.isDestination:
+            return False
+        if not plug.isChild:
+            return True
+        plug = plug.parent()
+
+
+_transformChannels = (
+    (('translateX', 'translateY', 'translateZ'), lambda mod, plug, v: mod.newPlugValueMDistance(plug, MDistance(v))),
+    (('rotateX', 'rotateY', 'rotateZ'), lambda mod, plug, v: mod.newPlugValueMAngle(plug, MAngle(v))),
+    (('scaleX', 'scaleY', 'scaleZ'), lambda mod, plug, v: mod.newPlugValueDouble(plug, v)),
+    (('shearXY', 'shearXZ', 'shearYZ'), lambda mod, plug, v: mod.newPlugValueDouble(plug, v)),
+)
+
+
+def setMatrices(nodes, matrices, space='world'):
+    """
+    Set the matrices of many transforms at once, matrices is an (N, 4, 4) array in internal units
+    and space is 'world' or 'local'.
+
+    World matrices are made local against the new world matrix of the parent when the parent is one of nodes,
+    or follow the nearest ancestor in nodes through the (unchanged) nodes in between, and are made local against
+    the current world matrix of the parent otherwise, so a whole hierarchy can be posed in one call.
+    The local matrices are decomposed into translate, rotate (respecting rotateOrder, rotateAxis and jointOrient),
+    scale and shear and written parent first in a single batch, so it is one undo step.
+    Pivots and the inverseScale of joints are ignored, locked and connected channels are left alone.
+    """
+    _requireNumpy()
+    if space not in ('world', 'local'):
+        raise ValueError("space must be 'world' or 'local', not %r" % space)
+    dagPaths = _dagPaths(nodes)
+    matrices = _np.array(matrices, dtype=float).reshape(-1, 4, 4)
+    if len(matrices) != len(dagPaths):
+        raise ValueError('got %i matrices for %i nodes' % (len(matrices), len(dagPaths)))
+    order = sorted(range(len(dagPaths)), key=lambda i: dagPaths[i].length())
+    dagPaths = [dagPaths[i] for i in order]
+    matrices = matrices[order]
+    count = len(dagPaths)
+
+    if space == 'world':
+        indices = dict((dagPath.fullPathName(), i) for i, dagPath in enumerate(dagPaths))
+        parentMatrices = _np.empty_like(matrices)
+        for i, dagPath in enumerate(dagPaths):
+            parentName = ancestorName = dagPath.fullPathName().rsplit('|', 1)[0]
+            ancestorIndex = indices.get(ancestorName)
+            while ancestorIndex is None and ancestorName:
+                ancestorName = ancestorName.rsplit('|', 1)[0]
+                ancestorIndex = indices.get(ancestorName)
+            if ancestorIndex is None:
+                parentMatrices[i] = _np.reshape(tuple(dagPath.exclusiveMatrix()), (4, 4))
+            elif ancestorName == parentName:
+                parentMatrices[i] = matrices[ancestorIndex]
+            else:
+                # the nodes in between keep their local matrices: exclusive * ancestor inverse * new ancestor world
+                between = _np.matmul(_np.reshape(tuple(dagPath.exclusiveMatrix()), (4, 4)),
+                                     _np.reshape(tuple(dagPaths[ancestorIndex].inclusiveMatrixInverse()), (4, 4)))
+                parentMatrices[i] = _np.matmul(between, matrices[ancestorIndex])
+        matrices = _np.matmul(matrices, _np.linalg.inv(parentMatrices))
+
+    translations, scales, shears = _np.empty((count, 3)), _np.empty((count, 3)), _np.empty((count, 3))
+    rotations, rotateAxes, jointOrients = _np.empty((count, 4)), _np.empty((count, 4)), _np.empty((count, 4))
+    rotateOrders = []
+    for i, (dagPath, matrix) in enumerate(zip(dagPaths, matrices.reshape(count, 16).tolist())):
+        transformation = MTransformationMatrix(MMatrix(matrix))
+        translations[i] = tuple(transformation.translation(MSpace.kTransform))
+        scales[i] = transformation.scale(MSpace.kTransform)
+        shears[i] = transformation.shear(MSpace.kTransform)
+        rotations[i] = tuple(transformation.rotation(asQuaternion=True))
+        node = dagPath.node()
+        if not node.hasFn(MFn.kTransform):
+            raise ValueError('%s is not a transform' % dagPath.fullPathName())
+        rotateAxes[i] = tuple(MFnTransform(dagPath).rotateOrientation(MSpace.kTransform))
+        if node.hasFn(MFn.kJoint):
+            plug = MPlug(node, _nodeClassAttribute('joint', 'jointOrient'))
+            jointOrients[i] = tuple(MEulerRotation(*(plug.child(c).asDouble() for c in range(3))).asQuaternion())
+        else:
+            jointOrients[i] = (0.0, 0.0, 0.0, 1.0)
+        rotateOrders.append(MPlug(node, _nodeClassAttribute('transform', 'rotateOrder')).asShort())
+
+    # the rotation of the local matrix is rotateAxis * rotate * jointOrient, strip the outer two
+    rotations = _np.matmul(_np.matmul(QuaternionArray._new(rotateAxes).asMatrix().transpose().asArray(),
+                                      QuaternionArray._new(rotations).asMatrix().asArray()),
+                           QuaternionArray._new(jointOrients).asMatrix().transpose().asArray())
+    eulers = _np.empty((count, 3))
+    for i, (rotation, rotateOrder) in enumerate(zip(rotations.reshape(count, 16).tolist(), rotateOrders)):
+        euler = MEulerRotation.decompose(MMatrix(rotation), rotateOrder)
+        eulers[i] = euler.x, euler.y, euler.z
+
+    with batch() as current:
+        modifier = current.modifier()
+        for i, dagPath in enumerate(dagPaths):
+            node = dagPath.node()
+            for (names, write), values in zip(_transformChannels, (translations, eulers, scales, shears)):
+                for name, value in zip(names, values[i].tolist()):
+                    plug = MPlug(node, _nodeClassAttribute('transform', name))
+                    if _isSettable(plug):
+                        write(modifier, plug, value)
+
+
 def _iter_transforms(nodeList):
     if not isinstance(nodeList, (list, tuple)):
         nodeList = [nodeList]
@@ -1006,3 +2924,262 @@ def allDescendants(nodeList):
         for ch in node.allDescendants():
             unique_children.add(ch)
     return unique_children
+
+
+class HierarchyIndex(object):
+    """
+    Snapshot of the dag built in a single MItDag pass, answers hierarchy queries without any Maya calls.
+
+    Every dag path is one entry in depth first order, stored in parallel arrays: parent, first child, next sibling,
+    the end of its subtree (so the descendants of an entry are the entries up to that end), depth and type,
+    next to the MObjectHandles and MDagPaths of the entries.
+    Dag changes, added or removed dag nodes and new scenes mark the index dirty, it is rebuilt on the next query,
+    call invalidate() to force that. Queries take wrapped nodes or names and return wrapped nodes.
+    """
+
+    def __init__(self):
+        self._dirty = True
+        self._callbackIds = []
+        ref = weakref.ref(self)  # the callbacks must not keep the index alive
+
+        def invalidate(*args):
+            index = ref()
+            if index is not None:
+                index._dirty = True
+
+        # noinspection PyBroadException
+        try:
+            self._callbackIds.append(MDagMessage.addAllDagChangesCallback(invalidate))
+            self._callbackIds.append(MDGMessage.addNodeAddedCallback(invalidate, 'dagNode'))
+            self._callbackIds.append(MDGMessage.addNodeRemovedCallback(invalidate, 'dagNode'))
+            self._callbackIds.append(MSceneMessage.addCallback(MSceneMessage.kBeforeNew, invalidate))
+            self._callbackIds.append(MSceneMessage.addCallback(MSceneMessage.kBeforeOpen, invalidate))
+        except:
+            if _debug:
+                warnings.warn('Could not install the hierarchy index callbacks, call invalidate() after dag changes')
+        self.rebuild()
+
+    def __del__(self):
+        # noinspection PyBroadException
+        try:
+            MMessage.removeCallbacks(self._callbackIds)
+        except:
+            pass
+
+    def invalidate(self):
+        self._dirty = True
+
+    def rebuild(self):
+        parents, firstChildren, nextSiblings, lastChildren, ends, depths, types = (array.array('i') for _ in range(7))
+        handles, paths, roots, typeNames, typeIds, indices = [], [], [], [], {}, {}
+        stack = []  # entries from the top to the current one
+        fn = MFnDependencyNode()
+        iterator = MItDag()
+        iterator.next()  # skip the world
+        while not iterator.isDone():
+            index = len(handles)
+            depth = iterator.depth() - 1
+            for entry in stack[depth:]:
+                ends[entry] = index
+            del stack[depth:]
+            parent = stack[-1] if stack else -1
+
+            path = iterator.getPath()
+            mobject = path.node()
+            handle = MObjectHandle(mobject)
+            fn.setObject(mobject)
+            typeId = typeIds.get(fn.typeName)
+            if typeId is None:
+                typeId = typeIds[fn.typeName] = len(typeNames)
+                typeNames.append(fn.typeName)
+
+            if parent == -1:
+                roots.append(index)
+            elif firstChildren[parent] == -1:
+                firstChildren[parent] = index
+            else:
+                nextSiblings[lastChildren[parent]] = index
+            if parent != -1:
+                lastChildren[parent] = index
+            for values, value in ((parents, parent), (firstChildren, -1), (nextSiblings, -1), (lastChildren, -1),
+                                  (ends, -1), (depths, depth), (types, typeId)):
+                values.append(value)
+            handles.append(handle)
+            paths.append(path)
+            indices[(handle.hashCode(), path.instanceNumber())] = index
+            stack.append(index)
+            iterator.next()
+        for entry in stack:
+            ends[entry] = len(handles)
+
+        self._parents, self._firstChildren, self._nextSiblings, self._ends = parents, firstChildren, nextSiblings, ends
+        self._depths, self._types, self._typeNames, self._typeIds = depths, types, typeNames, typeIds
+        self._handles, self._paths, self._roots, self._indices = handles, paths, roots, indices
+        self._dirty = False
+
+    def _entries(self):
+        if self._dirty:
+            self.rebuild()
+        return self._indices
+
+    def index(self, node):
+        # the entry of a node, raises ValueError when it is not a dag node in the index
+        indices = self._entries()
+        if not isinstance(node, DependNode):
+            node = wrapNode(node)
+        path = node._handle() if isinstance(node, DagNode) else None
+        index = indices.get((hash(node), path.instanceNumber())) if isinstance(path, MDagPath) else None
+        if index is None:
+            raise ValueError('%s is not in the hierarchy index' % node)
+        return index
+
+    def _wrap(self, index):
+        # a copy of the path, the wrapped node may keep it as its handle
+        path = self._paths[index]
+        return _wrapMObject(path.node(), MDagPath(path))
+
+    def _filter(self, indices, type):
+        if type is None:
+            return [self._wrap(i) for i in indices]
+        typeId = self._typeIds.get(type, -1)
+        return [self._wrap(i) for i in indices if self._types[i] == typeId]
+
+    def __len__(self):
+        self._entries()
+        return len(self._handles)
+
+    def __contains__(self, node):
+        try:
+            self.index(node)
+        except ValueError:
+            return False
+        return True
+
+    def roots(self, type=None):
+        self._entries()
+        return self._filter(self._roots, type)
+
+    def parent(self, node):
+        parent = self._parents[self.index(node)]
+        return None if parent == -1 else self._wrap(parent)
+
+    def children(self, node, type=None):
+        # type filters on the exact node type
+        indices = []
+        child = self._firstChildren[self.index(node)]
+        while child != -1:
+            indices.append(child)
+            child = self._nextSiblings[child]
+        return self._filter(indices, type)
+
+    def ancestors(self, node, type=None):
+        # nearest first
+        indices = []
+        parent = self._parents[self.index(node)]
+        while parent != -1:
+            indices.append(parent)
+            parent = self._parents[parent]
+        return self._filter(indices, type)
+
+    def descendants(self, node, type=None):
+        # depth first order
+        index = self.index(node)
+        return self._filter(range(index + 1, self._ends[index]), type)
+
+    def isAncestor(self, ancestor, node):
+        index = self.index(ancestor)
+        return index < self.index(node) < self._ends[index]
+
+    def depth(self, node):
+        return self._depths[self.index(node)]
+
+    def type(self, node):
+        return self._typeNames[self._types[self.index(node)]]
+
+
+_hierarchyIndex = None
+
+
+def hierarchyIndex():
+    # the shared index, kept up to date by its callbacks
+    global _hierarchyIndex
+    if _hierarchyIndex is None:
+        _hierarchyIndex = HierarchyIndex()
+    return _hierarchyIndex
+
+
+def walk(roots=None, breadthFirst=False, types=None, maxDepth=None, prune=None, raw=False):
+    """
+    Lazily walk the dag below roots (nodes or names, the whole scene when None) with MItDag.
+    Yields wrapped nodes, or MDagPaths when raw is True, depth first unless breadthFirst is set.
+    types is an MFn type or a list of them, other nodes are not yielded but are still walked through.
+    maxDepth limits how far below the roots to go (1 are the children), prune(node) returning True skips a node
+    and everything below it. Nodes are only wrapped when they are yielded (or pruned), so stopping early is cheap.
+    """
+    if roots is None or isinstance(roots, (DependNode, basestring)):
+        roots = [roots]
+    if types is not None and not isinstance(types, (list, tuple)):
+        types = (types,)
+    traversal = MItDag.kBreadthFirst if breadthFirst else MItDag.kDepthFirst
+    for root in roots:
+        iterator = MItDag(traversal)
+        rootDepth = 0
+        if root is not None:
+            rootPath = _dagPaths([root])[0]
+            iterator.reset(rootPath, traversal, MFn.kInvalid)
+            rootDepth = rootPath.length()
+        iterator.next()  # skip the root itself
+        while not iterator.isDone():
+            path = iterator.getPath()
+            if maxDepth is not None and path.length() - rootDepth >= maxDepth:
+                iterator.prune()
+            node = path if raw else None
+            if prune is not None:
+                if node is None:
+                    node = _wrapMObject(path.node(), path)
+                if prune(node):
+                    iterator.prune()
+                    iterator.next()
+                    continue
+            if types is None or any(path.hasFn(t) for t in types):
+                yield _wrapMObject(path.node(), path) if node is None else node
+            iterator.next()
+
+
+def _wrapMPlug(plug):
+    node = _wrapMObject(plug.node())
+    attr = _Attribute('%s.%s' % (node, plug.partialName(includeNonMandatoryIndices=True, includeInstancedIndices=True,
+                                                        useLongNames=True)), node.type())
+    attr._plug = plug
+    return attr
+
+
+def _walkGraph(root, downstream, types=None, match=None, maxDepth=None, prune=None, plugs=False, raw=False,
+               breadthFirst=False):
+    # follows connections from root (an MObject or MPlug), see DependNode.upstream for the arguments,
+    # items failing the types or match filters are not yielded but still walked through
+    # and they are only wrapped when they are yielded or passed to a callback
+    if types is not None and not isinstance(types, (list, tuple)):
+        types = (types,)
+    iterator = MItDependencyGraph(root, MFn.kInvalid,
+                                  MItDependencyGraph.kDownstream if downstream else MItDependencyGraph.kUpstream,
+                                  MItDependencyGraph.kBreadthFirst if breadthFirst else MItDependencyGraph.kDepthFirst,
+                                  MItDependencyGraph.kPlugLevel if plugs else MItDependencyGraph.kNodeLevel)
+    iterator.next()  # skip the root itself
+    while not iterator.isDone():
+        mobject = iterator.currentNode()
+        if maxDepth is not None and len(iterator.getNodePath()) - 1 >= maxDepth:
+            iterator.prune()
+        item = (iterator.currentPlug() if plugs else mobject) if raw else None
+        if prune is not None or match is not None:
+            if item is None:
+                item = _wrapMPlug(iterator.currentPlug()) if plugs else _wrapMObject(mobject)
+            if prune is not None and prune(item):
+                iterator.prune()
+                iterator.next()
+                continue
+        if (types is None or any(mobject.hasFn(t) for t in types)) and (match is None or match(item)):
+            if item is None:
+                item = _wrapMPlug(iterator.currentPlug()) if plugs else _wrapMObject(mobject)
+            yield item
+        iterator.next()
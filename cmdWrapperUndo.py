@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Maya plug-in that makes cmdWrapper.batch() undoable.
+
+API modifiers only end up in the undo queue when a command owns them, cmdWrapper loads this file on demand
+and calls the cmdWrapperUndo command with the batch it just built, the command keeps the batch for undo and redo.
+"""
+import sys
+# noinspection PyUnresolvedReferences
+from maya.api.OpenMaya import MPxCommand, MFnPlugin
+
+maya_useNewAPI = True
+
+# Maya imports plug-ins as modules of their own, so the queue is shared with cmdWrapper through sys
+queue = sys.__dict__.setdefault('_cmdWrapperUndoQueue', [])
+
+
+class CmdWrapperUndo(MPxCommand):
+    name = 'cmdWrapperUndo'
+
+    def __init__(self):
+        super(CmdWrapperUndo, self).__init__()
+        self._batch = None
+
+    def doIt(self, args):
+        if queue:
+            self._batch = queue.pop()
+            self.redoIt()
+
+    def redoIt(self):
+        self._batch.doIt()
+
+    def undoIt(self):
+        self._batch.undoIt()
+
+    def isUndoable(self):
+        return self._batch is not None
+
+
+def initializePlugin(plugin):
+    MFnPlugin(plugin, 'cmdWrapper', '1.0', 'Any').registerCommand(CmdWrapperUndo.name, CmdWrapperUndo)
+
+
+def uninitializePlugin(plugin):
+    MFnPlugin(plugin).deregisterCommand(CmdWrapperUndo.name)
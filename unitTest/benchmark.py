@@ -0,0 +1,353 @@
+import os, sys, timeit
+
+_basePath = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not _basePath in sys.path:
+    sys.path.insert(0, _basePath)
+
+# disable the crash reporting window.
+os.environ["MAYA_DEBUG_ENABLE_CRASH_REPORTING"] = "0"
+os.environ["PYMEL_SKIP_MEL_INIT"] = "Temp"
+
+import maya.standalone
+
+maya.standalone.initialize(name='python')
+
+import cmdWrapper
+from cmdWrapper import cmds, createNode
+
+# \~english micro benchmarks for the wrapper, run with mayapy: every entry prints the cost of a single operation
+_benchmarks = []
+
+
+def benchmark(fn):
+    _benchmarks.append(fn)
+    return fn
+
+
+def report(name, fn, number=10000):
+    seconds = timeit.timeit(fn, number=number)
+    print('%-60s %10.2f us' % (name, seconds / number * 1e6))
+
+
+@benchmark
+def attributeBackends():
+    node = createNode('transform')
+    node.addAttr('stringTest', type='string')
+    node.stringTest.set('test')
+    for backend in ('cmds', 'api'):
+        cmdWrapper.setAttributeBackend(backend)
+        translateX, translate, worldMatrix, string = node.translateX, node.translate, node.worldMatrix[0], node.stringTest
+        report('[%s] translateX.get()' % backend, translateX.get)
+        report('[%s] translate.get()' % backend, translate.get)
+        report('[%s] worldMatrix[0].get()' % backend, worldMatrix.get)
+        report('[%s] stringTest.get()' % backend, string.get)
+        report('[%s] translateX.set(1.0)' % backend, lambda: translateX.set(1.0))
+        report('[%s] translate.set(1.0, 2.0, 3.0)' % backend, lambda: translate.set(1.0, 2.0, 3.0))
+        report('[%s] node.translateX.get()' % backend, lambda: node.translateX.get())
+    cmdWrapper.setAttributeBackend('cmds')
+
+
+class _CallCounter(object):
+    # stands in for a module or class and counts every function called through it
+    def __init__(self, wrapped, counts):
+        self._wrapped = wrapped
+        self._counts = counts
+
+    def __getattr__(self, item):
+        attr = getattr(self._wrapped, item)
+        if not callable(attr):
+            return attr
+
+        def counted(*args, **kwargs):
+            self._counts[item] = self._counts.get(item, 0) + 1
+            return attr(*args, **kwargs)
+
+        return counted
+
+
+def countMayaCalls(fn):
+    # returns {maya function name: number of calls} made by fn() through the wrapper
+    from maya.api.OpenMaya import MSelectionList
+    counts = {}
+
+    class CountingSelectionList(MSelectionList):
+        def add(self, *args):
+            counts['MSelectionList.add'] = counts.get('MSelectionList.add', 0) + 1
+            return super(CountingSelectionList, self).add(*args)
+
+    patches = {'_cmds': _CallCounter(cmdWrapper._cmds, counts), 'MGlobal': _CallCounter(cmdWrapper.MGlobal, counts),
+               'MSelectionList': CountingSelectionList}
+    originals = dict((name, getattr(cmdWrapper, name)) for name in patches)
+    for name, patch in patches.items():
+        setattr(cmdWrapper, name, patch)
+    try:
+        fn()
+    finally:
+        for name, original in originals.items():
+            setattr(cmdWrapper, name, original)
+    return counts
+
+
+def legacyWrapNode(nodeName):
+    # the Maya calls wrapNode used to make before the single lookup fast path:
+    # objExists, nodeType and a selection list in wrapNode, ls(uuid=True) in pool() and ls(l=True) plus
+    # another selection list in updateHandle (which ran on every pool hit for dg nodes)
+    if not cmdWrapper._cmds.objExists(nodeName):
+        return None
+    cmdWrapper._cmds.nodeType(nodeName)
+    cmdWrapper.MGlobal.getSelectionListByName(nodeName).getDependNode(0)
+    cmdWrapper._cmds.ls(nodeName, uuid=True)
+    if cmdWrapper._cmds.ls(nodeName, l=True)[0][0] == '|':
+        return cmdWrapper.MGlobal.getSelectionListByName(nodeName).getDagPath(0)
+    return cmdWrapper.MGlobal.getSelectionListByName(nodeName).getDependNode(0)
+
+
+@benchmark
+def wrapNodeCalls():
+    transform = createNode('transform')
+    multiply = createNode('multiplyDivide')
+    for name in (str(transform), str(multiply)):
+        for label, fn in (('before', legacyWrapNode), ('after', cmdWrapper.wrapNode)):
+            counts = countMayaCalls(lambda: fn(name))
+            print('%-6s wrapNode(%r) makes %i Maya calls: %s' % (label, name, sum(counts.values()), counts))
+            report('%-6s wrapNode(%r)' % (label, name), lambda: fn(name))
+
+
+@benchmark
+def cmdsOverhead():
+    from maya import cmds as mayaCmds
+    node = createNode('transform')
+    name = str(node)
+    floats = [float(i) for i in range(16)]
+    for label, module, target in (('maya.cmds', mayaCmds, name), ('cmdWrapper.cmds', cmds, name),
+                                  ('cmdWrapper.cmds (wrapped args)', cmds, node)):
+        report('[%s] getAttr(translateX)' % label, lambda: module.getAttr('%s.translateX' % target))
+        report('[%s] setAttr(translateX, 1.0)' % label, lambda: module.setAttr('%s.translateX' % target, 1.0))
+        report('[%s] xform(q=True, ws=True, m=True)' % label, lambda: module.xform(target, q=True, ws=True, m=True))
+        report('[%s] xform(m=16 floats)' % label, lambda: module.xform(target, m=floats))
+        report('[%s] listAttr()' % label, lambda: module.listAttr(target), number=1000)
+        report('[%s] objExists()' % label, lambda: module.objExists(target))
+
+
+@benchmark
+def mathOperations():
+    from cmdWrapper import Matrix, Vector, Euler, QuaternionOrPoint
+    vector, other = Vector(1.0, 2.0, 3.0), Vector(3.0, 2.0, 1.0)
+    matrix = Matrix(1, 0, 0, 0, 0, 2, 0, 0, 0, 0, 3, 0, 1, 2, 3, 1)
+    euler = Euler(0.1, 0.2, 0.3)
+    quaternion = QuaternionOrPoint(euler.asQuaternion())
+    report('Vector.x / .y / .z', lambda: (vector.x, vector.y, vector.z), number=100000)
+    report('Vector.normal()', vector.normal, number=100000)
+    report('Vector * float', lambda: vector * 2.0, number=100000)
+    report('Vector * Vector (dot)', lambda: vector * other, number=100000)
+    report('Vector ^ Vector (cross)', lambda: vector ^ other, number=100000)
+    report('Vector * Matrix', lambda: vector * matrix, number=100000)
+    report('tuple(Vector)', lambda: tuple(vector), number=100000)
+    report('Vector == Vector', lambda: vector == other, number=100000)
+    report('Matrix.inverse()', matrix.inverse, number=100000)
+    report('Matrix * Matrix', lambda: matrix * matrix, number=100000)
+    report('tuple(Matrix)', lambda: tuple(matrix), number=100000)
+    report('Matrix == Matrix', lambda: matrix == matrix, number=100000)
+    report('Euler.inverse()', euler.inverse, number=100000)
+    report('QuaternionOrPoint.normal()', quaternion.normal, number=100000)
+    report('QuaternionOrPoint.inverse()', quaternion.inverse, number=100000)
+    report('QuaternionOrPoint * QuaternionOrPoint', lambda: quaternion * quaternion, number=100000)
+
+
+@benchmark
+def mathArrays():
+    from cmdWrapper import Vector, Euler, VectorArray, MatrixArray
+    count = 100000
+    vectors = [Vector(i, i * 0.5, -i) for i in range(count)]
+    matrices = [Euler(i * 0.001, 0.2, 0.3).asMatrix() for i in range(count)]
+    vectorArray, matrixArray = VectorArray.fromList(vectors), MatrixArray.fromList(matrices)
+    report('[loop] %i x Vector * Matrix' % count, lambda: [v * m for v, m in zip(vectors, matrices)], number=1)
+    report('[array] %i x Vector * Matrix' % count, lambda: vectorArray * matrixArray, number=1)
+    report('[loop] %i x Matrix.inverse()' % count, lambda: [m.inverse() for m in matrices], number=1)
+    report('[array] %i x Matrix.inverse()' % count, matrixArray.inverse, number=1)
+    report('[loop] %i x Vector.normal()' % count, lambda: [v.normal() for v in vectors], number=1)
+    report('[array] %i x Vector.normal()' % count, vectorArray.normal, number=1)
+    report('VectorArray.fromList(%i Vectors)' % count, lambda: VectorArray.fromList(vectors), number=1)
+    report('VectorArray.toList() %i Vectors' % count, vectorArray.toList, number=1)
+
+
+@benchmark
+def bulkMatrices():
+    from cmdWrapper import getMatrices
+    joints = [createNode('joint')]
+    for i in range(4999):
+        joints.append(cmds.createNode('joint', p=joints[-1] if i % 50 else joints[0]))
+    report('[xform] 5000 x Transform.getM(ws=True)', lambda: [joint.getM(ws=True) for joint in joints], number=1)
+    report('[bulk] getMatrices(5000 joints, world)', lambda: getMatrices(joints), number=1)
+    report('[bulk] getMatrices(5000 joints, local)', lambda: getMatrices(joints, 'local'), number=1)
+    names = [str(joint) for joint in joints]
+    report('[bulk] getMatrices(5000 names, world)', lambda: getMatrices(names), number=1)
+
+
+@benchmark
+def bulkSetMatrices():
+    from cmdWrapper import getMatrices, setMatrices
+    joints = [createNode('joint')]
+    for i in range(2999):
+        joints.append(cmds.createNode('joint', p=joints[-1] if i % 30 else joints[0]))
+    world = getMatrices(joints)
+    matrices = [joint.getM(ws=True) for joint in joints]
+    report('[xform] 3000 x Transform.setM(ws=True)',
+           lambda: [joint.setM(matrix, ws=True) for joint, matrix in zip(joints, matrices)], number=1)
+    report('[bulk] setMatrices(3000 joints, world)', lambda: setMatrices(joints, world), number=1)
+
+
+@benchmark
+def hierarchyQueries():
+    from cmdWrapper import HierarchyIndex
+    nodes = [createNode('transform')]
+    for i in range(1999):
+        nodes.append(cmds.createNode('transform', p=nodes[i // 4]))
+    report('[listRelatives] parent() of 2000 nodes', lambda: [node.parent() for node in nodes], number=1)
+    report('[listRelatives] children() of 2000 nodes', lambda: [node.children() for node in nodes], number=1)
+    report('HierarchyIndex() build', HierarchyIndex, number=1)
+    index = HierarchyIndex()
+    report('[index] parent() of 2000 nodes', lambda: [index.parent(node) for node in nodes], number=1)
+    report('[index] children() of 2000 nodes', lambda: [index.children(node) for node in nodes], number=1)
+    report('[index] descendants() of the root', lambda: index.descendants(nodes[0]), number=1)
+
+
+@benchmark
+def walkHierarchy():
+    from cmdWrapper import walk
+    root = createNode('transform')
+    nodes = [root]
+    for i in range(19999):
+        nodes.append(cmds.createNode('transform', p=nodes[i // 4]))
+    last = str(nodes[-1])
+    report('[listRelatives] allDescendants() of 20000 nodes', root.allDescendants, number=1)
+    report('[walk] all 20000 nodes', lambda: list(root.walk()), number=1)
+    report('[walk] first node', lambda: next(root.walk()), number=100)
+    report('[walk] raw search for the last node', lambda: next(p for p in walk(root, raw=True) if p.fullPathName() == last),
+           number=1)
+
+
+@benchmark
+def lockChannels():
+    from cmdWrapper import lockAttrs
+    nodes = [createNode('transform') for _ in range(2000)]
+    report('[setLocked] 2000 x t, r, s leaf=True',
+           lambda: [node.plug(attr).setLocked(True, leaf=True) for node in nodes for attr in 'trs'], number=1)
+    report('[lockAttrs] 2000 x t, r, s leaf=True', lambda: lockAttrs(nodes, ['t', 'r', 's'], False, leaf=True),
+           number=1)
+
+
+@benchmark
+def arrayAttributes():
+    node = createNode('transform')
+    node.addAttr('weightsTest', type='double', m=True)
+    indices, values = list(range(0, 20000, 2)), [i * 0.001 for i in range(10000)]
+    report('[setAttr] 10000 sparse elements', lambda: [cmds.setAttr('%s.weightsTest[%i]' % (node, i), v)
+                                                        for i, v in zip(indices, values)], number=1)
+    report('[setArray] 10000 sparse elements', lambda: node.weightsTest.setArray(indices, values), number=1)
+    report('[iter] 10000 sparse elements', lambda: [attr.get() for attr in node.weightsTest], number=1)
+    report('[getArray] 10000 sparse elements', node.weightsTest.getArray, number=1)
+
+
+@benchmark
+def meshPoints():
+    mesh = cmds.polyPlane(sx=700, sy=700, ch=False)[0].shape()
+    report('[xform] 1000 vertices', lambda: [cmds.xform('%s.vtx[%i]' % (mesh, i), q=True, t=True)
+                                             for i in range(1000)], number=1)
+    report('[getPoints] %i vertices' % cmds.polyEvaluate(mesh, v=True), mesh.getPoints, number=1)
+    points = mesh.getPoints()
+    report('[setPoints] %i vertices' % len(points), lambda: mesh.setPoints(points), number=1)
+
+
+@benchmark
+def skinWeights():
+    mesh = cmds.polyPlane(sx=100, sy=100, ch=False)[0]
+    joints = [createNode('joint')]
+    for i in range(19):
+        joints.append(cmds.createNode('joint', p=joints[-1]))
+    skin = cmds.skinCluster(joints, mesh, tsb=True)[0]
+    report('[attributes] weightList[0:100].weights', lambda: [[attr.get() for attr in skin.weightList[i].weights]
+                                                              for i in range(100)], number=1)
+    report('[getWeights] all %i points' % cmds.polyEvaluate(mesh, v=True), skin.getWeights, number=1)
+    weights = skin.getWeights()
+    report('[setWeights] all %i points' % len(weights), lambda: skin.setWeights(weights), number=1)
+
+
+@benchmark
+def animCurveKeys():
+    node = createNode('transform')
+    count = 5000
+    times, values = list(range(count)), [i * 0.1 for i in range(count)]
+    report('[setKeyframe] %i keys' % count, lambda: [cmds.setKeyframe(node, at='translateX', t=t, v=v)
+                                                     for t, v in zip(times, values)], number=1)
+    curve = node.translateX.animCurve()
+    report('[keyframe] %i keys' % count, lambda: [cmds.keyframe(curve, q=True, index=(i, i), vc=True)
+                                                  for i in range(count)], number=1)
+    report('[getKeys] %i keys' % count, curve.getKeys, number=1)
+    report('[setKeys] %i keys' % count, lambda: curve.setKeys(times, values), number=1)
+
+
+@benchmark
+def sampleOverTime():
+    from cmdWrapper import sampleAttrs
+    node = createNode('transform')
+    for frame in range(0, 101, 10):
+        cmds.setKeyframe(node, at='translateX', t=frame, v=frame * 0.5)
+    frames = list(range(101))
+
+    def currentTimeLoop():
+        values = []
+        for frame in frames:
+            cmds.currentTime(frame)
+            values.append(node.worldMatrix[0].get())
+        return values
+
+    report('[currentTime] worldMatrix[0] over 101 frames', currentTimeLoop, number=1)
+    report('[sample] worldMatrix[0] over 101 frames', lambda: node.worldMatrix[0].sample(frames), number=1)
+    report('[sampleAttrs] worldMatrix[0], translate over 101 frames',
+           lambda: sampleAttrs([node.worldMatrix[0], node.translate], frames), number=1)
+
+
+@benchmark
+def arrayData():
+    import numpy
+    from maya import cmds as mayaCmds
+    node = createNode('transform')
+    node.addAttr('pointsTest', type='pointArray')
+    points = numpy.random.rand(100000, 3)
+    report('[maya.cmds] setAttr 100000 points', lambda: mayaCmds.setAttr(
+        '%s.pointsTest' % node, len(points), *[tuple(p) + (1.0,) for p in points.tolist()], type='pointArray'), number=1)
+    report('[set] 100000 points', lambda: node.pointsTest.set(points), number=1)
+    report('[maya.cmds] getAttr 100000 points', lambda: mayaCmds.getAttr('%s.pointsTest' % node), number=1)
+    report('[get] 100000 points', node.pointsTest.get, number=1)
+
+
+@benchmark
+def graphWalk():
+    nodes = [createNode('transform')]
+    for i in range(500):
+        node = createNode('multDoubleLinear')
+        nodes[-1].plug('translateX' if i == 0 else 'output') >> node.input1
+        nodes.append(node)
+
+    def listConnectionsWalk(node):
+        result = []
+        stack = [node]
+        while stack:
+            # the wrapped listConnections already returns nodes
+            for downstream in cmds.listConnections(stack.pop(), s=False, d=True) or []:
+                result.append(downstream)
+                stack.append(downstream)
+        return result
+
+    report('[listConnections] 500 nodes downstream', lambda: listConnectionsWalk(nodes[0]), number=1)
+    report('[downstream] 500 nodes', lambda: list(nodes[0].downstream()), number=1)
+    report('[downstream] 500 raw nodes', lambda: list(nodes[0].downstream(raw=True)), number=1)
+    report('[downstream] first node', lambda: next(nodes[0].downstream()), number=100)
+
+
+if __name__ == '__main__':
+    for fn in _benchmarks:
+        print(' ============ %s ============ ' % fn.__name__)
+        fn()
+    sys.exit()
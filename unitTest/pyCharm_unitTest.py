@@ -15,6 +15,11 @@ class TestCmds(unittest.TestCase):
         # continue
         super(TestCmds, self).__init__(methodName)
 
+    def setUp(self):
+        # every test starts from a new scene, so default node names don't depend on the order the tests run in
+        from cmdWrapper import cmds
+        cmds.file(new=True, force=True)
+
     def assertAlmostEqualIterable(self, a, b, msg=None):
         if len(a) == len(b):
             for ae, be in zip(a, b):
@@ -232,6 +237,17 @@ class TestCmds(unittest.TestCase):
 
         nVec = Vector(1, 0, 0) * Matrix()
 
+        # methods returning new math objects keep the wrapped class
+        self.assertTrue(isinstance(Vector(2, 0, 0).normal(), Vector))
+        self.assertEqual(Vector(2, 0, 0).normal(), Vector(1, 0, 0))
+        self.assertTrue(isinstance(testMatrix.inverse(), Matrix))
+        self.assertTrue(isinstance(testMatrix.transpose(), Matrix))
+        self.assertTrue(isinstance(rot.inverse(), Euler))
+        self.assertTrue(isinstance(rot.reorder(Euler.kXZY), Euler))
+        self.assertTrue(isinstance(quatRot.conjugate(), QuaternionOrPoint))
+        self.assertTrue(isinstance(quatRot.normal(), QuaternionOrPoint))
+        self.assertEqual(list(Vector(1, 2, 3)), [1, 2, 3])
+
         vec = Vector()
         vec[0:2] = (1, 1)
         self.assertEqual(vec - Vector(1, 1, 0), Vector())
@@ -274,6 +290,689 @@ class TestCmds(unittest.TestCase):
         print(myEntry)
         self.assertEqual(myEntry, Vector(9,1,6))     
 
+    def testAttributeTypes(self):
+        from cmdWrapper import cmds, createNode, _attributeTypes
+
+        transform = createNode("transform")
+        self.assertEqual(transform.translate.type(), "double3")
+        self.assertEqual(_attributeTypes[("transform", "translate")], "double3")
+        transform.translate.set(1.0, 2.0, 3.0)
+        self.assertEqual(transform.translate(), (1.0, 2.0, 3.0))
+
+        # dynamic attributes are resolved per node and never cached on the node type
+        transform.addAttr("dynamicTest", type="double3")
+        transform.addAttr("dynamicTestX", type="double", parent="dynamicTest")
+        transform.addAttr("dynamicTestY", type="double", parent="dynamicTest")
+        transform.addAttr("dynamicTestZ", type="double", parent="dynamicTest")
+        transform.dynamicTest.set(4.0, 5.0, 6.0)
+        self.assertEqual(transform.dynamicTest(), (4.0, 5.0, 6.0))
+        self.assertNotIn(("transform", "dynamicTest"), _attributeTypes)
+
+    def testApiAttributeBackend(self):
+        import cmdWrapper
+        from cmdWrapper import cmds, Vector, Matrix, Euler
+
+        transform = cmds.createNode("transform", n="apiBackend")
+        transform.addAttr("stringTest", type="string")
+        cmdWrapper.setAttributeBackend("api")
+        try:
+            transform.translate = (1.0, 2.0, 3.0)
+            self.assertEqual(transform.translate(), Vector(1.0, 2.0, 3.0))
+            transform.tx.set(5.0)
+            self.assertEqual(transform.tx(), 5.0)
+            transform.visibility.set(False)
+            self.assertEqual(transform.visibility(), False)
+            transform.stringTest.set("apiString")
+            self.assertEqual(transform.stringTest(), "apiString")
+            transform.rotate = (90.0, 0.0, 0.0)
+            self.assertEqual(transform.rotate(), Euler(90.0, 0.0, 0.0))
+            self.assertEqual(transform.rotateOrder(), 0)
+            self.assertTrue(isinstance(transform.worldMatrix[0](), Matrix))
+            apiMatrix = transform.worldMatrix[0]()
+        finally:
+            cmdWrapper.setAttributeBackend("cmds")
+        self.assertEqual(transform.translate(), Vector(5.0, 2.0, 3.0))
+        self.assertEqual(transform.stringTest(), "apiString")
+        self.assertEqual(transform.worldMatrix[0](), apiMatrix)
+        self.assertRaises(ValueError, cmdWrapper.setAttributeBackend, "pymel")
+
+        # compounds with array children, like the weightList elements of a skinCluster, take the generic path
+        mesh = cmds.polyPlane(sx=1, sy=1, ch=False)[0]
+        joint = cmds.createNode("joint")
+        skin = cmds.skinCluster(joint, mesh, tsb=True)[0]
+        plug = skin.weightList[0].asPlug()
+        self.assertEqual(cmdWrapper._plugReader(plug), None)
+        self.assertEqual(cmdWrapper._plugWriter(plug), (None, 0))
+        weights = skin.weightList[0]()
+        cmdWrapper.setAttributeBackend("api")
+        try:
+            self.assertEqual(skin.weightList[0](), weights)
+        finally:
+            cmdWrapper.setAttributeBackend("cmds")
+
+    def testGetAttrs(self):
+        from cmdWrapper import cmds, getAttrs, Vector, Matrix
+
+        nodes = [cmds.createNode("transform", n="bulkRead%i" % i) for i in range(3)]
+        for i, node in enumerate(nodes):
+            node.translate = (float(i), 0.0, 1.0)
+        nodes[1].visibility = False
+        result = getAttrs(nodes + ["doesNotExist"], ["translate", "visibility", "worldMatrix[0]"])
+        self.assertEqual([tuple(t) for t in result["translate"][:3]], [(0.0, 0.0, 1.0), (1.0, 0.0, 1.0), (2.0, 0.0, 1.0)])
+        self.assertEqual(list(result["visibility"][:3]), [True, False, True])
+        self.assertEqual(result["translate"][3], None)
+
+        wrapped = getAttrs(nodes, ["translate", "worldMatrix[0]"], wrap=True)
+        self.assertEqual(wrapped["translate"][2], Vector(2.0, 0.0, 1.0))
+        self.assertTrue(isinstance(wrapped["worldMatrix[0]"][0], Matrix))
+
+    def testBatch(self):
+        from cmdWrapper import cmds, createNode, batch, Vector
+
+        source = cmds.createNode("transform", n="batchSource")
+        cmds.undoInfo(state=True)
+        with batch():
+            target = createNode("transform")
+            source.translate = (1.0, 2.0, 3.0)
+            source.translate >> target.translate
+            target.rename("batchTarget")
+            self.assertEqual(source.translate(), Vector(0.0, 0.0, 0.0))
+        self.assertEqual(target.shortName(), "batchTarget")
+        self.assertEqual(target.translate(), Vector(1.0, 2.0, 3.0))
+
+        cmds.undo()
+        self.assertFalse(cmds.objExists("batchTarget"))
+        self.assertEqual(source.translate(), Vector(0.0, 0.0, 0.0))
+        cmds.redo()
+        self.assertTrue(cmds.objExists("batchTarget"))
+
+        try:
+            with batch():
+                source.translateX.set(5.0)
+                raise KeyError()
+        except KeyError:
+            pass
+        self.assertEqual(source.tx(), 1.0)
+
+        # queued commands find their node by its name when they run, after the renames queued before them,
+        # deleting construction history is queued in order as well
+        source.addAttr("stringArrayTest", type="stringArray")
+        cube, history = cmds.polyCube(n="batchCube")
+        history = history.name()
+        with batch():
+            source.rename("batchSourceRenamed")
+            source.stringArrayTest.set(2, "a", "b", type="stringArray")
+            cube.delete(constructionHistory=True)
+            self.assertTrue(cmds.objExists(history))
+        self.assertEqual(cmds.getAttr("batchSourceRenamed.stringArrayTest"), ["a", "b"])
+        self.assertFalse(cmds.objExists(history))
+        cmds.undo()
+        self.assertTrue(cmds.objExists("batchSource"))
+        self.assertTrue(cmds.objExists(history))
+
+        # single api writes outside a batch are undoable too, also after the plug-in was unloaded
+        import cmdWrapper
+        cmdWrapper.setAttributeBackend("api")
+        try:
+            source.translateY.set(7.0)
+            cmds.undo()
+            self.assertEqual(source.ty(), 2.0)
+            cmds.flushUndo()
+            cmds.unloadPlugin("cmdWrapperUndo")
+            source.translateY.set(8.0)
+            self.assertEqual(source.ty(), 8.0)
+            cmds.undo()
+            self.assertEqual(source.ty(), 2.0)
+        finally:
+            cmdWrapper.setAttributeBackend("cmds")
+
+    def testNodePool(self):
+        from cmdWrapper import cmds, getNode, DependNode
+
+        node = cmds.createNode("transform", n="pooled")
+        stats = DependNode.poolStats()
+        self.assertTrue(getNode("pooled") is node)
+        self.assertEqual(DependNode.poolStats()["hits"], stats["hits"] + 1)
+
+        size = DependNode.poolStats()["size"]
+        node.delete()
+        self.assertEqual(DependNode.poolStats()["size"], size - 1)
+
+        DependNode.setPoolSize(2)
+        try:
+            nodes = [cmds.createNode("transform") for _ in range(4)]
+            self.assertEqual(DependNode.poolStats()["size"], 2)
+        finally:
+            DependNode.setPoolSize(None)
+
+        cmds.file(f=True, new=True)
+        self.assertEqual(DependNode.poolStats()["size"], 0)
+
+        # the pool is keyed on the node, not its name
+        node = cmds.createNode("transform", n="poolRename")
+        node.rename("poolRenamed")
+        self.assertTrue(getNode("poolRenamed") is node)
+        cmds.namespace(add="poolNs")
+        namespaced = cmds.createNode("transform", n="poolNs:pooled")
+        self.assertTrue(getNode("poolNs:pooled") is namespaced)
+        self.assertFalse(getNode("poolRenamed") is namespaced)
+
+        # every callback is registered once, removing them leaves none behind and wrapping installs them again
+        import cmdWrapper
+        self.assertEqual(sorted(cmdWrapper._callbackIds), ["names", "nodePool"])
+        cmdWrapper.removeCallbacks()
+        self.assertEqual(cmdWrapper._callbackIds, {})
+        cmds.rename(namespaced, "poolNs:renamedWithoutCallbacks")
+        self.assertEqual(namespaced.name(), "poolNs:renamedWithoutCallbacks")
+        cmds.createNode("transform", n="poolReinstall")
+        self.assertEqual(sorted(cmdWrapper._callbackIds), ["names", "nodePool"])
+
+    def testWrapNode(self):
+        from cmdWrapper import cmds, wrapNode, createNode, DependNode, Transform, Joint, Shape
+
+        self.assertEqual(wrapNode("doesNotExist"), None)
+        self.assertEqual(wrapNode("doesNotExist.translate"), None)
+        transform = createNode("transform")
+        self.assertTrue(wrapNode(str(transform)) is transform)
+        self.assertTrue(wrapNode(transform) is transform)
+        self.assertEqual(type(transform), Transform)
+        self.assertEqual(transform.type(), "transform")
+        self.assertEqual(type(createNode("joint")), Joint)
+        self.assertEqual(type(wrapNode("perspShape")), Shape)
+        multiply = createNode("multiplyDivide")
+        self.assertEqual(type(multiply), DependNode)
+        self.assertEqual(multiply.type(), "multiplyDivide")
+        self.assertEqual(str(wrapNode(multiply.name() + ".input1X")), multiply.name() + ".input1X")
+
+    def testGetNodeList(self):
+        from cmdWrapper import cmds, getNode
+        from maya import cmds as mayaCmds
+
+        names = ["|persp", "doesNotExist", "perspShape", "|persp", "persp.translate", "time1"]
+        nodes = getNode(names)
+        self.assertEqual(len(nodes), len(names))
+        self.assertEqual(nodes[1], None)
+        self.assertTrue(nodes[0] is nodes[3])
+        self.assertEqual(nodes[2], nodes[0].shape())
+        self.assertEqual(str(nodes[4]), "|persp.translate")
+        self.assertEqual(nodes[5].type(), "time")
+        self.assertEqual(getNode(["doesNotExist"]), [None])
+        self.assertEqual(cmds.ls(type="camera"), getNode(mayaCmds.ls(type="camera")))
+
+    def testNodeNames(self):
+        from cmdWrapper import cmds, createNode
+
+        cmds.undoInfo(state=True)
+        parent = cmds.createNode("transform", n="nameParent")
+        child = cmds.createNode("transform", n="nameChild", p=parent)
+        lookup = {child: "child"}
+        self.assertEqual(str(child), "|nameParent|nameChild")
+        parent.rename("nameParentRenamed")
+        self.assertEqual(str(child), "|nameParentRenamed|nameChild")
+        other = createNode("transform")
+        parent.setParent(other)
+        self.assertEqual(str(child), "|%s|nameParentRenamed|nameChild" % other.name())
+        self.assertEqual(lookup[child], "child")
+        cmds.undo()
+        self.assertEqual(str(child), "|nameParentRenamed|nameChild")
+        multiply = createNode("multiplyDivide")
+        multiply.rename("renamedMultiply")
+        self.assertEqual(str(multiply), "renamedMultiply")
+
+    def testReturnKinds(self):
+        from cmdWrapper import cmds, registerReturnKind, DependNode, _returnKinds
+
+        node = cmds.createNode("transform", n="kindTest")
+        node.addAttr("stringTest", type="string")
+        # a string attribute holding a node name stays a string, getAttr is registered as returning plain values
+        node.stringTest.set("persp")
+        self.assertEqual(cmds.getAttr(node.stringTest), "persp")
+        locator = cmds.spaceLocator()[0]
+        self.assertTrue(isinstance(locator, DependNode))
+        self.assertEqual(cmds.spaceLocator(locator, q=True, p=True), [0.0, 0.0, 0.0])
+        self.assertEqual(cmds.listAttr(node, st="stringTest"), ["stringTest"])
+
+        try:
+            registerReturnKind("nodeType", "auto")
+            self.assertEqual(cmds.nodeType(node), "transform")  # not a node name, so the raw value comes back
+            registerReturnKind("nodeType", "value")
+        finally:
+            _returnKinds["nodeType"] = ("value", "value", "value")
+        self.assertRaises(ValueError, registerReturnKind, "ls", "nodes")
+
+        # keyframe and file return nodes for some flags, so they are not registered as values
+        cmds.setKeyframe(node, at="translateX", t=1, v=0.0)
+        self.assertEqual(cmds.keyframe(node, q=True, name=True), [node.translateX.animCurve()])
+
+    def testUnwrapArguments(self):
+        from cmdWrapper import cmds, createNode, _unwrap, _Cmd
+
+        node = createNode("transform")
+        floats = [1.0, 2.0, 3.0]
+        self.assertTrue(_unwrap(floats) is floats)
+        self.assertTrue(_unwrap("persp") == "persp")
+        self.assertEqual(_unwrap((node, node.translateX)), (str(node), "%s.translateX" % node))
+        self.assertEqual(_unwrap([[node], [1, 2]]), [[str(node)], [1, 2]])
+        self.assertTrue(cmds.getAttr is cmds.getAttr)
+        cmds.select([node], r=True)
+        self.assertEqual(cmds.ls(sl=True), [node])
+        cmds.xform(node, t=floats)
+        self.assertEqual(cmds.xform(node, q=True, t=True), floats)
+        # list keyword arguments holding wrapped objects reach the command as names
+        other = createNode("transform")
+        received = {}
+        recorder = _Cmd(lambda *args, **kwargs: received.update(kwargs), "recorder")
+        recorder(node, targets=[node, other.translateX], weights=[1.0, 0.5])
+        self.assertEqual(received["targets"], [str(node), "%s.translateX" % other])
+        self.assertEqual(received["weights"], [1.0, 0.5])
+
+    def testMathArrays(self):
+        from cmdWrapper import Vector, Matrix, Euler, QuaternionOrPoint, VectorArray, MatrixArray, QuaternionArray
+
+        vectors = [Vector(1, 2, 3), Vector(-4, 0.5, 2)]
+        matrices = [Euler(0.3, -0.2, 1.1).asMatrix(), Euler(-1.0, 0.4, 0.2).asMatrix()]
+        matrices[0].setT((1, 2, 3))
+        quaternions = [QuaternionOrPoint(Euler(0.3, -0.2, 1.1).asQuaternion()),
+                       QuaternionOrPoint(Euler(-1.0, 0.4, 0.2).asQuaternion())]
+        vectorArray = VectorArray.fromList(vectors)
+        matrixArray = MatrixArray.fromList(matrices)
+        quaternionArray = QuaternionArray.fromList(quaternions)
+
+        self.assertEqual(vectorArray.toList(), vectors)
+        self.assertEqual(matrixArray[0], matrices[0])
+        for i in range(2):
+            self.assertAlmostEqualIterable((vectorArray + vectorArray)[i], vectors[i] + vectors[i])
+            self.assertAlmostEqualIterable((vectorArray * 2.0)[i], vectors[i] * 2.0)
+            self.assertAlmostEqual((vectorArray * vectorArray)[i], vectors[i] * vectors[i])
+            self.assertAlmostEqualIterable((vectorArray ^ vectors[1])[i], vectors[i] ^ vectors[1])
+            self.assertAlmostEqualIterable(vectorArray.normal()[i], vectors[i].normal())
+            self.assertAlmostEqualIterable((vectorArray * matrixArray)[i], vectors[i] * matrices[i])
+            self.assertAlmostEqualIterable(vectorArray.transformAsPoint(matrixArray)[i],
+                                           QuaternionOrPoint(vectors[i]) * matrices[i])
+            self.assertAlmostEqualIterable((matrixArray * matrixArray)[i], matrices[i] * matrices[i])
+            self.assertAlmostEqualIterable(matrixArray.inverse()[i], matrices[i].inverse())
+            self.assertAlmostEqualIterable(matrixArray.transpose()[i], matrices[i].transpose())
+            self.assertAlmostEqualIterable(quaternionArray.asMatrix()[i], quaternions[i].asMatrix())
+            self.assertAlmostEqualIterable((quaternionArray * quaternions[1])[i], quaternions[i] * quaternions[1])
+            self.assertAlmostEqualIterable(quaternionArray.inverse()[i], quaternions[i].inverse())
+            self.assertAlmostEqualIterable(vectorArray.rotateBy(quaternionArray)[i], vectors[i].rotateBy(quaternions[i]))
+            self.assertAlmostEqualIterable(quaternionArray.slerp(quaternions[1], 0.25)[i],
+                                           QuaternionOrPoint.slerp(quaternions[i], quaternions[1], 0.25))
+
+    def testGetMatrices(self):
+        from cmdWrapper import cmds, getMatrices, getTranslations, Matrix
+
+        parent = cmds.createNode("transform", n="matrixParent")
+        child = cmds.createNode("joint", n="matrixChild", p=parent)
+        parent.translate = (1.0, 2.0, 3.0)
+        parent.rotate = (10.0, 20.0, 30.0)
+        child.translate = (0.0, 4.0, 0.0)
+        child.jointOrient = (0.0, 0.0, 45.0)
+        nodes = [parent, child.name()]
+
+        world = getMatrices(nodes)
+        self.assertEqual(world.shape, (2, 4, 4))
+        for i, node in enumerate((parent, child)):
+            self.assertAlmostEqualIterable(world[i].ravel(), node.getM(ws=True))
+            self.assertAlmostEqualIterable(getMatrices(nodes, "local")[i].ravel(), node.getM())
+            self.assertAlmostEqualIterable(getMatrices(nodes, "parentInverse")[i].ravel(),
+                                           Matrix(cmds.getAttr(node.parentInverseMatrix[0])))
+        self.assertAlmostEqualIterable(getTranslations(nodes)[1], child.getM(ws=True).asT())
+        self.assertRaises(ValueError, getMatrices, [parent], "object")
+        self.assertRaises(ValueError, getMatrices, ["doesNotExist"])
+        self.assertRaises(ValueError, getMatrices, [cmds.createNode("multiplyDivide")])
+
+    def testSetMatrices(self):
+        from cmdWrapper import cmds, createNode, getMatrices, setMatrices
+
+        source = [cmds.createNode("transform", n="poseSource")]
+        target = [cmds.createNode("joint", n="poseTarget")]
+        for i in range(3):
+            source.append(cmds.createNode("transform", p=source[-1]))
+            target.append(cmds.createNode("joint", p=target[-1]))
+        for i, node in enumerate(source):
+            node.translate = (i, 1.0 + i, -2.0)
+            node.rotate = (10.0 * i, 20.0, -30.0 + i)
+            node.scale = (1.0, 1.0 + i * 0.1, 1.0)
+        for i, node in enumerate(target):
+            node.jointOrient = (5.0, 10.0 * i, 0.0)
+            node.rotateAxis = (0.0, 0.0, 15.0)
+            node.rotateOrder = i
+            node.segmentScaleCompensate = False  # inverseScale is not taken into account
+        # children first, parents being set must still be used as the new parent space
+        world = getMatrices(source)
+        setMatrices(target[::-1], world[::-1])
+        self.assertTrue(abs(getMatrices(target) - world).max() < 1e-6)
+        cmds.undo()
+        self.assertFalse(abs(getMatrices(target) - world).max() < 1e-6)
+        cmds.redo()
+
+        local = getMatrices(source, "local")
+        setMatrices(target, local, "local")
+        self.assertTrue(abs(getMatrices(target, "local") - local).max() < 1e-6)
+
+        # an identity world matrix puts the free channels at the inverse of the parent, locked ones are kept
+        parentInverse = getMatrices(target[1:2], "parentInverse")[0]
+        target[1].translateX.setLocked(True)
+        setMatrices(target[1:2], getMatrices([createNode("transform")]))
+        self.assertAlmostEqual(target[1].translateX.get(), local[1][3][0])
+        self.assertAlmostEqual(target[1].translateY.get(), parentInverse[3][1])
+        self.assertAlmostEqual(target[1].translateZ.get(), parentInverse[3][2])
+        self.assertRaises(ValueError, setMatrices, target, world[:2])
+        self.assertRaises(ValueError, setMatrices, target, world, "object")
+
+        # an offset group that is not set itself follows its ancestor, its child lands where it was asked to
+        rig = cmds.createNode("transform", n="offsetRig")
+        offset = cmds.createNode("transform", n="offsetGroup", p=rig)
+        control = cmds.createNode("transform", n="offsetControl", p=offset)
+        offset.translate = (0.0, 3.0, 1.0)
+        offset.rotate = (0.0, 45.0, 10.0)
+        offset.scale = (2.0, 2.0, 2.0)
+        posed = getMatrices(source[:2])
+        setMatrices([control, rig], posed[::-1])
+        self.assertTrue(abs(getMatrices([rig, control]) - posed).max() < 1e-6)
+        self.assertEqual(offset.translate(), (0.0, 3.0, 1.0))
+
+    def testHierarchyIndex(self):
+        from cmdWrapper import cmds, HierarchyIndex, hierarchyIndex
+
+        top = cmds.createNode("transform", n="indexTop")
+        middle = cmds.createNode("transform", n="indexMiddle", p=top)
+        leafA = cmds.createNode("joint", n="indexLeafA", p=middle)
+        leafB = cmds.createNode("transform", n="indexLeafB", p=middle)
+        index = HierarchyIndex()
+
+        self.assertEqual(index.parent(middle), top)
+        self.assertEqual(index.parent(top), None)
+        self.assertEqual(index.children(middle), [leafA, leafB])
+        self.assertEqual(index.children("indexMiddle", type="joint"), [leafA])
+        self.assertEqual(index.ancestors(leafB), [middle, top])
+        self.assertEqual(index.descendants(top), [middle, leafA, leafB])
+        self.assertTrue(index.isAncestor(top, leafA))
+        self.assertFalse(index.isAncestor(leafA, top))
+        self.assertEqual(index.depth(leafA), 2)
+        self.assertEqual(index.type(leafA), "joint")
+        self.assertTrue(top in index)
+        self.assertFalse(cmds.createNode("multiplyDivide") in index)
+
+        # dag changes invalidate the index
+        cmds.parent(leafB, top)
+        self.assertEqual(index.children(top), [middle, leafB])
+        child = cmds.createNode("transform", p=leafA)
+        self.assertEqual(index.descendants(middle), [leafA, child])
+        cmds.delete(child)
+        self.assertEqual(index.descendants(middle), [leafA])
+        self.assertTrue(hierarchyIndex() is hierarchyIndex())
+
+    def testWalk(self):
+        from cmdWrapper import cmds, walk
+        from maya.api.OpenMaya import MFn, MDagPath
+
+        top = cmds.createNode("transform", n="walkTop")
+        a = cmds.createNode("transform", n="walkA", p=top)
+        b = cmds.createNode("joint", n="walkB", p=top)
+        aa = cmds.createNode("joint", n="walkAA", p=a)
+        shape = cmds.createNode("locator", p=aa)
+
+        self.assertEqual(list(top.walk()), [a, aa, shape, b])
+        self.assertEqual(list(top.walk(breadthFirst=True)), [a, b, aa, shape])
+        self.assertEqual(list(top.walk(types=MFn.kJoint)), [aa, b])
+        self.assertEqual(list(top.walk(types=[MFn.kJoint, MFn.kLocator])), [aa, shape, b])
+        self.assertEqual(list(top.walk(maxDepth=1)), [a, b])
+        self.assertEqual(list(top.walk(prune=lambda node: node == a)), [b])
+        self.assertTrue(all(isinstance(path, MDagPath) for path in top.walk(raw=True)))
+        self.assertEqual(list(walk(["walkA", b])), [aa, shape])
+        # stops early
+        iterator = walk()
+        self.assertTrue(next(iterator) is not None)
+
+    def testAttrFlags(self):
+        from cmdWrapper import cmds, createNode, lockAttrs, keyableAttrs, channelBoxAttrs
+
+        nodes = [createNode("transform") for _ in range(3)]
+        self.assertEqual([attr.name().rsplit(".", 1)[-1] for attr in nodes[0].translate._recurse()],
+                         ["translateX", "translateY", "translateZ"])
+        self.assertEqual(len(list(nodes[0].worldMatrix._recurse())), 0)
+
+        lockAttrs(nodes, ["t", "r", "s", "doesNotExist"], leaf=True)
+        for node in nodes:
+            for attr in ("translate", "rotateY", "scaleZ"):
+                self.assertTrue(cmds.getAttr("%s.%s" % (node, attr), lock=True))
+        cmds.undo()
+        self.assertFalse(cmds.getAttr("%s.rotateY" % nodes[1], lock=True))
+        cmds.redo()
+        lockAttrs(nodes, ["r"], lock=False)
+        self.assertFalse(cmds.getAttr("%s.rotate" % nodes[2], lock=True))
+        self.assertTrue(cmds.getAttr("%s.rotateX" % nodes[2], lock=True))
+
+        keyableAttrs(nodes, ["v"], False)
+        channelBoxAttrs(nodes, ["v"])
+        self.assertFalse(cmds.getAttr("%s.visibility" % nodes[0], keyable=True))
+        self.assertTrue(cmds.getAttr("%s.visibility" % nodes[0], channelBox=True))
+
+    def testArrayAttributes(self):
+        from cmdWrapper import cmds, createNode
+
+        node = createNode("transform")
+        node.addAttr("weightsTest", type="double", m=True)
+        node.addAttr("pointsTest", type="double3", m=True)
+        node.addAttr("pointsTestX", type="double", p="pointsTest")
+        node.addAttr("pointsTestY", type="double", p="pointsTest")
+        node.addAttr("pointsTestZ", type="double", p="pointsTest")
+
+        node.weightsTest.setArray([0, 3, 7], [0.25, 0.5, 1.0])
+        indices, values = node.weightsTest.getArray()
+        self.assertEqual(list(indices), [0, 3, 7])
+        self.assertEqual(list(values), [0.25, 0.5, 1.0])
+        self.assertEqual(cmds.getAttr(node.weightsTest[3]), 0.5)
+        node.weightsTest.setArray([3, 5], [0.1, 0.2], clear=True)
+        self.assertEqual(list(node.weightsTest.getArray()[0]), [3, 5])
+        cmds.undo()
+        self.assertEqual(list(node.weightsTest.getArray()[0]), [0, 3, 7])
+
+        node.pointsTest.setArray([2, 4], [(1.0, 2.0, 3.0), (4.0, 5.0, 6.0)])
+        indices, values = node.pointsTest.getArray()
+        self.assertEqual([tuple(row) for row in values], [(1.0, 2.0, 3.0), (4.0, 5.0, 6.0)])
+        self.assertRaises(ValueError, node.translateX.getArray)
+        self.assertRaises(ValueError, node.weightsTest.setArray, [0], [1.0, 2.0])
+
+    def testShapeGeometry(self):
+        from cmdWrapper import cmds, getNode
+
+        cube = cmds.polyCube(ch=False)[0]
+        mesh = cube.shape()
+        # the wrapped cmds already return nodes, getNode passes them through
+        self.assertTrue(getNode(mesh) is mesh)
+        self.assertEqual(getNode([cube, mesh]), [cube, mesh])
+        attribute = cube.translateX
+        self.assertTrue(getNode(attribute) is attribute)
+        cube.translate = (0.0, 10.0, 0.0)
+        points = mesh.getPoints()
+        self.assertEqual(points.shape, (8, 3))
+        self.assertAlmostEqualIterable(points[0], cmds.pointPosition("%s.vtx[0]" % mesh, local=True))
+        self.assertAlmostEqualIterable(mesh.getPoints("world")[0], points[0] + (0.0, 10.0, 0.0))
+        mesh.setPoints(points * 2.0)
+        self.assertAlmostEqualIterable(cmds.pointPosition("%s.vtx[7]" % mesh, local=True), points[7] * 2.0)
+        cmds.undo()
+        self.assertAlmostEqualIterable(mesh.getPoints()[7], points[7])
+        mesh.setPoints(points, "world")
+        self.assertAlmostEqualIterable(mesh.getPoints()[7], points[7] - (0.0, 10.0, 0.0))
+        self.assertEqual(mesh.getNormals().shape, (8, 3))
+        self.assertEqual(mesh.getUVs().shape, (cmds.polyEvaluate(mesh, uv=True), 2))
+        self.assertRaises(ValueError, mesh.setPoints, points[:4])
+        self.assertRaises(ValueError, mesh.getPoints, "local")
+
+        curve = cmds.curve(d=1, p=[(0, 0, 0), (1, 0, 0), (1, 1, 0)]).shape()
+        self.assertAlmostEqualIterable(curve.getPoints()[2], (1, 1, 0))
+        curve.setPoints([(0, 0, 0), (2, 0, 0), (2, 2, 0)])
+        self.assertAlmostEqualIterable(cmds.pointPosition("%s.cv[2]" % curve), (2, 2, 0))
+        self.assertRaises(ValueError, curve.getUVs)
+
+        surface = cmds.nurbsPlane(ch=False)[0].shape()
+        self.assertEqual(len(surface.getPoints()), 16)
+
+    def testSkinCluster(self):
+        import os, tempfile
+        from cmdWrapper import cmds, SkinCluster, SkinWeights
+
+        mesh = cmds.polyPlane(sx=2, sy=2, ch=False)[0]
+        rootA = cmds.createNode("joint", n="skinRootA")
+        tipA = cmds.createNode("joint", n="skinTipA", p=rootA)
+        skin = cmds.skinCluster(rootA, tipA, mesh, tsb=True)[0]
+        self.assertTrue(isinstance(skin, SkinCluster))
+        self.assertEqual(skin.influenceNames(), ["skinRootA", "skinTipA"])
+
+        dense = [[1.0, 0.0], [0.5, 0.5], [0.0, 1.0]] * 3
+        skin.setWeights(SkinWeights.fromDense(["skinTipA", "skinRootA"], [row[::-1] for row in dense]))
+        weights = skin.getWeights()
+        self.assertEqual(len(weights), 9)
+        self.assertEqual(list(weights.indptr), [0, 1, 3, 4, 5, 7, 8, 9, 11, 12])
+        self.assertAlmostEqualIterable(weights.toDense().ravel(), [w for row in dense for w in row])
+        self.assertAlmostEqual(cmds.skinPercent(skin, "%s.vtx[1]" % mesh, q=True, t="skinTipA"), 0.5)
+        cmds.undo()
+        self.assertNotAlmostEqual(skin.getWeights().toDense()[0][1], 0.0)
+        cmds.redo()
+
+        # restore by name onto a skinCluster with namespaced influences in a different order, the second
+        # skinB:skinTipA makes the influence name a dag path, so both the namespace and the path are stripped
+        path = os.path.join(tempfile.mkdtemp(), "weights.npz")
+        skin.exportWeights(path)
+        other = cmds.polyPlane(sx=2, sy=2, ch=False)[0]
+        cmds.namespace(add="skinB")
+        rootB = cmds.createNode("joint", n="skinB:skinRootA")
+        tipB = cmds.createNode("joint", n="skinB:skinTipA", p=rootB)
+        cmds.createNode("transform", n="skinB:skinTipA")
+        skinB = cmds.skinCluster(tipB, rootB, other, tsb=True)[0]
+        self.assertEqual(skinB.influenceNames(), ["skinB:skinRootA|skinB:skinTipA", "skinB:skinRootA"])
+        skinB.importWeights(path)
+        self.assertAlmostEqualIterable(skinB.getWeights().toDense()[1], (0.5, 0.5))
+        self.assertAlmostEqualIterable(skinB.getWeights().toDense()[0], (0.0, 1.0))
+        self.assertRaises(ValueError, skinB.setWeights, SkinWeights.fromDense(["missing"], [[1.0]] * 9))
+
+    def testAnimCurve(self):
+        from cmdWrapper import cmds, createNode, AnimCurve
+        from maya.api.OpenMayaAnim import MFnAnimCurve
+
+        node = createNode("transform")
+        self.assertEqual(node.rotateY.animCurve(), None)
+        for frame, value in ((1, 0.0), (10, 90.0), (20, 45.0)):
+            cmds.setKeyframe(node, at="rotateY", t=frame, v=value)
+        curve = node.rotateY.animCurve()
+        self.assertTrue(isinstance(curve, AnimCurve))
+        self.assertEqual(curve.numKeys(), 3)
+
+        keys = curve.getKeys()
+        self.assertEqual(list(keys["times"]), [1.0, 10.0, 20.0])
+        self.assertAlmostEqualIterable(keys["values"], [0.0, 90.0, 45.0])
+        self.assertEqual(len(keys["inAngles"]), 3)
+
+        curve.setKeys([0, 5, 10, 15], [1.0, 2.0, 3.0, 4.0], MFnAnimCurve.kTangentLinear,
+                      [MFnAnimCurve.kTangentLinear] * 3 + [MFnAnimCurve.kTangentStep])
+        self.assertEqual(cmds.keyframe(curve, q=True, tc=True), [0.0, 5.0, 10.0, 15.0])
+        self.assertEqual(cmds.keyframe(curve, q=True, vc=True), [1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(cmds.keyTangent(curve, q=True, ott=True)[-1], "step")
+        cmds.undo()
+        self.assertEqual(cmds.keyframe(curve, q=True, tc=True), [1.0, 10.0, 20.0])
+        cmds.redo()
+        self.assertEqual(curve.numKeys(), 4)
+
+        # the getKeys round trip keeps an unweighted curve unweighted, weighted=True switches explicitly
+        keys = curve.getKeys()
+        curve.setKeys(**keys)
+        self.assertAlmostEqualIterable(curve.getKeys()["outAngles"], keys["outAngles"])
+        self.assertEqual(cmds.keyTangent(curve, q=True, weightedTangents=True), [False])
+        curve.setKeys(weighted=True, **keys)
+        self.assertEqual(cmds.keyTangent(curve, q=True, weightedTangents=True), [True])
+        cmds.undo()
+        self.assertEqual(cmds.keyTangent(curve, q=True, weightedTangents=True), [False])
+        self.assertRaises(ValueError, curve.setKeys, [0, 1], [0.0])
+
+    def testSample(self):
+        from cmdWrapper import cmds, createNode, sampleAttrs
+
+        node = createNode("transform")
+        cmds.setKeyframe(node, at="translateX", t=1, v=0.0)
+        cmds.setKeyframe(node, at="translateX", t=11, v=10.0, itt="linear", ott="linear")
+        cmds.keyTangent(node, at="translateX", itt="linear", ott="linear")
+        cmds.currentTime(1)
+
+        self.assertAlmostEqualIterable(node.translateX.sample([1, 6, 11]), [0.0, 5.0, 10.0])
+        self.assertEqual(cmds.currentTime(q=True), 1.0)
+        translate, matrix = sampleAttrs([node.translate, "%s.worldMatrix[0]" % node], range(1, 12))
+        self.assertEqual(translate.shape, (11, 3))
+        self.assertEqual(matrix.shape, (11, 4, 4))
+        self.assertAlmostEqual(matrix[5][3][0], 5.0)
+        self.assertRaises(ValueError, node.worldMatrix.sample, [1])
+
+    def testArrayData(self):
+        import array
+        import numpy
+        from cmdWrapper import cmds, createNode, setArrayFormat
+
+        node = createNode("transform")
+        for attr in ("doubleArray", "Int32Array", "pointArray", "vectorArray"):
+            node.addAttr(attr + "Test", type=attr)
+
+        node.doubleArrayTest.set(numpy.arange(5, dtype=float))
+        self.assertEqual(cmds.getAttr(node.doubleArrayTest), [0.0, 1.0, 2.0, 3.0, 4.0])
+        values = node.doubleArrayTest.get()
+        self.assertTrue(isinstance(values, numpy.ndarray))
+        self.assertEqual(list(values), [0.0, 1.0, 2.0, 3.0, 4.0])
+        node.Int32ArrayTest.set([3, 2, 1])
+        self.assertEqual(node.Int32ArrayTest.get().dtype, numpy.int32)
+        node.pointArrayTest.set(numpy.array([(1.0, 2.0, 3.0), (4.0, 5.0, 6.0)]))
+        self.assertEqual(node.pointArrayTest.get().tolist(), [[1.0, 2.0, 3.0, 1.0], [4.0, 5.0, 6.0, 1.0]])
+        node.vectorArrayTest.set([(1.0, 0.0, 0.0)])
+        self.assertEqual(node.vectorArrayTest.get().shape, (1, 3))
+        cmds.undo()
+        self.assertFalse(cmds.getAttr(node.vectorArrayTest))
+        # other attributes are told apart by their cached type or their value, without resolving a plug
+        node.translate.set([0.0, 0.0, 0.0])  # caches the type of the static attribute
+        translate = node.translate
+        translate.set([1.0, 2.0, 3.0])
+        self.assertEqual(tuple(translate.get()), (1.0, 2.0, 3.0))
+        self.assertTrue(translate._plug is None)
+        node.addAttr("scalarTest", type="double")
+        scalar = node.scalarTest
+        scalar.set(2.0)
+        self.assertEqual(scalar.get(), 2.0)
+        self.assertTrue(scalar._plug is None)
+
+        setArrayFormat("array")
+        try:
+            self.assertEqual(node.pointArrayTest.get(), array.array("d", [1, 2, 3, 1, 4, 5, 6, 1]))
+            node.vectorArrayTest.set(array.array("d", [0, 1, 0, 0, 0, 1]))
+            self.assertEqual(node.vectorArrayTest.get(), array.array("d", [0, 1, 0, 0, 0, 1]))
+        finally:
+            setArrayFormat("numpy")
+        self.assertRaises(ValueError, setArrayFormat, "list")
+
+    def testGraphWalk(self):
+        from cmdWrapper import cmds, createNode, DependNode
+        from maya.api.OpenMaya import MFn, MObject, MPlug
+
+        source = createNode("transform")
+        multiply = createNode("multiplyDivide")
+        plus = createNode("plusMinusAverage")
+        target = createNode("transform")
+        source.translate >> multiply.input1
+        multiply.output >> plus.input3D[0]
+        plus.output3D >> target.translate
+
+        self.assertEqual(list(source.downstream()), [multiply, plus, target])
+        self.assertEqual(list(target.upstream()), [plus, multiply, source])
+        self.assertEqual(list(source.downstream(maxDepth=1)), [multiply])
+        self.assertEqual(list(source.downstream(types=MFn.kTransform)), [target])
+        self.assertEqual(list(source.downstream(prune=lambda node: node == plus)), [multiply])
+        self.assertEqual(list(source.downstream(match=lambda node: node.type() == "plusMinusAverage")), [plus])
+        self.assertTrue(all(isinstance(item, MObject) for item in source.downstream(raw=True)))
+
+        attrs = list(source.downstream(plugs=True))
+        self.assertTrue(multiply.input1 in attrs)
+        self.assertTrue(all(isinstance(item, MPlug) for item in source.downstream(plugs=True, raw=True)))
+        self.assertEqual(list(target.translate.upstream(maxDepth=1)), [plus])
+        self.assertTrue(isinstance(next(multiply.output.downstream()), DependNode))
+
 
 if __name__ == '__main__':
     unittest.main()